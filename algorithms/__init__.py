@@ -1,2 +1,5 @@
 from .rwm import *
-from .pt_rwm import *
\ No newline at end of file
+from .batched_rwm import *
+from .mala import *
+from .pt_rwm import *
+from .multiprocess_pt_rwm import *
\ No newline at end of file
@@ -0,0 +1,153 @@
+import numpy as np
+from interfaces import MHAlgorithm, TargetDistribution, ProposalDistribution, Chain, RandomBuffer, log_uniform, default_block_size
+from proposal_distributions import IsotropicGaussianProposal
+
+
+class BatchedRandomWalkMH(MHAlgorithm):
+    """Random Walk Metropolis-Hastings engine that advances many independent chains at once.
+
+    The current states of all chains are held as one (num_chains, dim) array, so each step
+    makes one batched proposal draw, one batched log target density evaluation and one
+    vectorized accept test instead of num_chains separate Python calls.
+    Each chain may have its own proposal variance and inverse temperature, which makes it
+    possible to run a whole grid of variances (or seeds) in a single simulation.
+
+    The chain attribute stores the joint state of all chains at each iteration,
+    i.e. every element has shape (num_chains, dim). Use set_chain_storage("streaming") to keep only
+    the current states and running per-chain statistics.
+    """
+    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=True, num_chains=1, beta=1.0,
+                 beta_ladder=None, swap_acceptance_rate=None, proposal: ProposalDistribution = None,
+                 block_size=None):
+        """Initialize the BatchedRandomWalkMH engine.
+
+        Args:
+            dim (int): Dimension of each chain.
+            var (float or np.ndarray): Proposal variance, either shared by all chains or one value per chain.
+            target_dist (TargetDistribution): The target distribution.
+            symmetric (bool): Whether the proposal distribution is symmetric.
+            num_chains (int): Number of independent chains to run.
+            beta (float or np.ndarray): Inverse temperature, either shared by all chains or one value per chain.
+            proposal (ProposalDistribution): The proposal kernel, an isotropic Gaussian by default.
+            block_size (int): Number of steps of proposal noise and accept test uniforms drawn at a time.
+                Defaults to DEFAULT_BLOCK_SIZE chain-steps spread over the chains, bounded by the buffer memory
+                in high dimensions (see default_block_size).
+
+        Note: the beta_ladder and swap_acceptance_rate are not used in this implementation,
+        this is due to higher-level code that uses the same interface for different algorithms."""
+        super().__init__(dim, var, target_dist, symmetric)
+        self.num_chains = num_chains
+        self.vars = np.broadcast_to(np.asarray(var, dtype=float), (num_chains,)).copy()
+        self.betas = np.broadcast_to(np.asarray(beta, dtype=float), (num_chains,)).copy()
+        self.proposal = proposal if proposal is not None else IsotropicGaussianProposal(dim)
+        if block_size is None:
+            block_size = default_block_size(dim, num_chains)
+        self.noise = RandomBuffer(self.proposal.sample_noise, shape=(num_chains,), block_size=block_size)
+        self.log_uniforms = RandomBuffer(log_uniform, shape=(num_chains,), block_size=block_size)
+        self.chain = Chain(np.random.random((num_chains, dim)))
+        self.curr_states = self.chain[0].copy()
+        self.num_steps = 0
+        self.num_proposals = np.zeros(num_chains, dtype=int)       # per-chain proposal counts
+        self.num_acceptances = np.zeros(num_chains, dtype=int)     # per-chain acceptance counts
+        self.acceptance_rate = np.zeros(num_chains)
+        self.log_target_density_curr_state = np.full(num_chains, -np.inf)
+        self.name = "BatchedRWM"
+
+    def get_name(self):
+        """
+        Return the name of the MHAlgorithm as a string.
+        """
+        return self.name
+
+    def reset(self):
+        """Reset all chains to their initial states and clear the acceptance statistics."""
+        super().reset()
+        self.curr_states = self.chain[0].copy()
+        self.num_steps = 0
+        self.num_proposals[:] = 0
+        self.num_acceptances[:] = 0
+        self.acceptance_rate[:] = 0
+        self.log_target_density_curr_state[:] = -np.inf
+
+    def set_chain_storage(self, storage, path=None):
+        """Choose how the chain is stored before the algorithm is run, see MHAlgorithm.set_chain_storage.
+        The "run_length" storage is not supported: a row of the chain holds the states of all chains,
+        so it starts a new run whenever any of them accepts and compresses almost nothing."""
+        if storage == "run_length":
+            raise ValueError("The run_length chain storage is not supported by batched engines, "
+                             "please run the chains one at a time or use another storage.")
+        super().set_chain_storage(storage, path=path)
+
+    def get_curr_state(self):
+        """Return the current states of all chains as a (num_chains, dim) array."""
+        return self.curr_states
+
+    def set_curr_state(self, state):
+        """Set the current states of all chains."""
+        self.curr_states = np.array(state, dtype=float)
+        self.chain[-1] = self.curr_states
+
+    def advance(self, active=None):
+        """Move the chains one Random Walk Metropolis-Hastings step without recording them in the chain.
+        Each chain moves to its proposed state with probability min(1, A) where A is its acceptance probability.
+
+        Args:
+            active (np.ndarray): Boolean mask of the chains to move, all chains by default.
+                The target density is only evaluated for the active chains, the others stay put.
+        Returns:
+            np.ndarray: Boolean mask of the chains that accepted their proposal.
+        """
+        # one proposal per chain, each row with its own covariance (var / beta) * C
+        proposed_states = self.proposal.propose(self.curr_states, self.noise.next(), self.vars, self.betas)
+        log_u = self.log_uniforms.next()
+        if active is None:
+            log_target_density_proposed_states = self.target_dist.log_density_batch(proposed_states)
+        else:
+            log_target_density_proposed_states = np.full(self.num_chains, -np.inf)
+            log_target_density_proposed_states[active] = self.target_dist.log_density_batch(proposed_states[active])
+
+        with np.errstate(invalid='ignore'):     # -inf - (-inf) is nan, which is never accepted
+            log_accept_ratios = self.betas * (log_target_density_proposed_states - self.log_target_density_curr_state)
+            if not self.symmetric:
+                log_accept_ratios += self.proposal.log_proposal_ratio(self.curr_states, proposed_states, self.vars, self.betas)
+            accepted = (log_accept_ratios > 0) | (log_u < log_accept_ratios)
+        if active is not None:
+            accepted &= active
+
+        self.update_states(accepted, proposed_states, log_target_density_proposed_states, active)
+        return accepted
+
+    def update_states(self, accepted, proposed_states, log_target_density_proposed_states, active=None):
+        """Move the chains that accepted their proposal to the proposed states and update the acceptance statistics.
+
+        Args:
+            accepted (np.ndarray): Boolean mask of the chains that accepted their proposal.
+            proposed_states (np.ndarray): The (num_chains, dim) proposed states.
+            log_target_density_proposed_states (np.ndarray): The log target densities of the proposed states.
+            active (np.ndarray): Boolean mask of the chains that made a proposal, all chains by default.
+        """
+        self.curr_states = np.where(accepted[:, None], proposed_states, self.curr_states)
+        self.log_target_density_curr_state = np.where(accepted, log_target_density_proposed_states,
+                                                      self.log_target_density_curr_state)
+        self.num_steps += 1
+        self.num_proposals += 1 if active is None else active
+        self.num_acceptances += accepted
+        # same convention as RandomWalkMH: the initial state counts towards the chain length
+        self.acceptance_rate = self.num_acceptances / (self.num_proposals + 1)
+
+    def step(self):
+        """Take one Random Walk Metropolis-Hastings step for every chain simultaneously and record the new states."""
+        if self.advance().any():
+            self.chain.append(self.curr_states)
+        else:
+            self.chain.repeat_last()
+
+    def expected_squared_jump_distance(self):
+        """Return the expected squared jump distance of each chain as an array of length num_chains."""
+        if self.num_steps == 0:
+            raise ValueError("The algorithm has not been run yet.")
+        return self.chain.expected_squared_jump_distance()
+
+    def get_chain(self, i):
+        """Return the recorded history of chain i as a (num_iterations + 1, dim) array."""
+        return np.asarray(self.chain)[:, i]
@@ -0,0 +1,168 @@
+import numpy as np
+from interfaces import MHAlgorithm, TargetDistribution, RandomBuffer, log_uniform, default_block_size
+from proposal_distributions import IsotropicGaussianProposal
+from algorithms import BatchedRandomWalkMH
+
+
+def langevin_log_proposal_ratio(current_states, proposed_states, noise, grad_log_target_density_proposed_states, var, beta=1.0):
+    """Compute the Hastings correction log q(current | proposed) - log q(proposed | current) of the
+    Langevin proposal y = x + (var / 2) * grad log pi(x) + sqrt(var / beta) * z in closed form.
+
+    Since proposed - current - (var / 2) * grad log pi(current) = sqrt(var / beta) * noise, the forward
+    term only needs the noise. Works row-wise on (n, dim) arrays, with var and beta either scalars
+    or one value per row.
+
+    Args:
+        current_states (np.ndarray): The current states.
+        proposed_states (np.ndarray): The proposed states.
+        noise (np.ndarray): The standard normal noise the proposed states were made with.
+        grad_log_target_density_proposed_states (np.ndarray): The gradients of the log target density at the proposed states.
+        var (float or np.ndarray): The proposal variance.
+        beta (float or np.ndarray): The inverse temperature.
+    """
+    var = np.asarray(var, dtype=float)[..., None]
+    beta = np.asarray(beta, dtype=float)[..., None]
+    backward = current_states - proposed_states - 0.5 * var * grad_log_target_density_proposed_states
+    return 0.5 * np.sum(noise ** 2, axis=-1) - np.sum(0.5 * beta / var * backward ** 2, axis=-1)
+
+
+class MALA(MHAlgorithm):
+    """Implementation of the Metropolis-adjusted Langevin algorithm (MALA) for sampling from a target distribution.
+
+    At inverse temperature beta the target is pi^beta and the proposal is
+        y = x + (var / 2) * grad log pi(x) + sqrt(var / beta) * z,    z ~ N(0, I),
+    i.e. a Langevin step of size var / beta on pi^beta. The proposal is never symmetric, so the closed-form
+    Hastings correction is always applied and the symmetric argument is ignored. The log target density
+    and its gradient at the current state are cached, so each step evaluates them once, at the proposed state.
+    """
+    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=False, beta=1.0, beta_ladder=None,
+                 swap_acceptance_rate=None, block_size=None):
+        """Initialize the MALA algorithm. Note: the beta_ladder and swap_acceptance_rate are not used in this implementation,
+        this is due to higher-level code that uses the same interface for different algorithms.
+        The proposal noise and the accept test uniforms are drawn block_size steps at a time,
+        by default DEFAULT_BLOCK_SIZE steps bounded by the buffer memory (see default_block_size)."""
+        super().__init__(dim, var, target_dist, symmetric)
+        if block_size is None:
+            block_size = default_block_size(dim)
+        self.proposal = IsotropicGaussianProposal(dim)
+        self.noise = RandomBuffer(self.proposal.sample_noise, block_size=block_size)
+        self.log_uniforms = RandomBuffer(log_uniform, block_size=block_size)
+        self.num_acceptances = 0    # use this to calculate acceptance rate
+        self.acceptance_rate = 0
+        self.log_target_density_curr_state = -np.inf    # this is the log density of the current state, used to reduce redundant computation
+        self.grad_log_target_density_curr_state = None  # the gradient at the current state, computed on the first step
+        self.beta = beta
+        self.name = "MALA"
+
+    def get_name(self):
+        """
+        Return the name of the MHAlgorithm as a string.
+        """
+        return self.name
+
+    def reset(self):
+        """Reset the Markov chain to the initial state."""
+        super().reset()
+        self.log_target_density_curr_state = -np.inf
+        self.grad_log_target_density_curr_state = None
+
+    def set_curr_state(self, state):
+        """Set the current state of the algorithm. Its cached log density and gradient are discarded."""
+        self.chain[-1] = state
+        self.log_target_density_curr_state = -np.inf
+        self.grad_log_target_density_curr_state = None
+
+    def step(self):
+        """Take a step using the Metropolis-adjusted Langevin algorithm.
+        Add the new state to the chain with probability min(1, A) where A is the acceptance probability.
+        """
+        current_state = self.chain[-1]
+        if self.grad_log_target_density_curr_state is None:
+            self.grad_log_target_density_curr_state = self.target_dist.grad_log_density(current_state)
+        noise = self.noise.next()
+        proposed_state = (current_state + 0.5 * self.var * self.grad_log_target_density_curr_state
+                          + np.sqrt(self.var / self.beta) * noise)
+        log_u = self.log_uniforms.next()
+
+        log_target_density_proposed_state = self.log_target_density(proposed_state)
+        grad_log_target_density_proposed_state = self.target_dist.grad_log_density(proposed_state)
+        with np.errstate(invalid='ignore'):     # nan when the proposed state is outside the support, never accepted
+            log_accept_ratio = (self.beta * (log_target_density_proposed_state - self.log_target_density_curr_state)
+                                + langevin_log_proposal_ratio(current_state, proposed_state, noise,
+                                                              grad_log_target_density_proposed_state, self.var, self.beta))
+        # accept the proposed state with probability min(1, A)
+        if log_accept_ratio > 0 or log_u < log_accept_ratio:
+            self.chain.append(proposed_state)
+            self.log_target_density_curr_state = log_target_density_proposed_state
+            self.grad_log_target_density_curr_state = grad_log_target_density_proposed_state
+            self.num_acceptances += 1
+        else:
+            self.chain.repeat_last()
+        self.acceptance_rate = self.num_acceptances / len(self.chain)
+
+
+class BatchedMALA(BatchedRandomWalkMH):
+    """Metropolis-adjusted Langevin engine that advances many independent chains at once, see MALA.
+
+    It has the interface of BatchedRandomWalkMH, so it can replace it wherever a batched engine is used,
+    e.g. as the engine of the rungs of ParallelTemperingRWM (rung_sampler="mala"). Each chain may have
+    its own proposal variance and inverse temperature. The gradients of the log target density are
+    evaluated with one grad_log_density_batch call per step and cached for the current states.
+    """
+    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=False, num_chains=1, beta=1.0,
+                 beta_ladder=None, swap_acceptance_rate=None, proposal=None, block_size=None):
+        """Initialize the BatchedMALA engine, see BatchedRandomWalkMH for the arguments.
+        The Langevin proposal is isotropic, so proposal can only be an IsotropicGaussianProposal."""
+        if proposal is not None and not isinstance(proposal, IsotropicGaussianProposal):
+            raise ValueError("MALA only supports the isotropic Gaussian proposal.")
+        super().__init__(dim, var, target_dist, symmetric, num_chains=num_chains, beta=beta,
+                         proposal=proposal, block_size=block_size)
+        self.grad_log_target_density_curr_state = None  # (num_chains, dim), computed on the first step
+        self.name = "BatchedMALA"
+
+    def reset(self):
+        """Reset all chains to their initial states and clear the acceptance statistics."""
+        super().reset()
+        self.grad_log_target_density_curr_state = None
+
+    def set_curr_state(self, state):
+        """Set the current states of all chains. Their cached gradients are discarded."""
+        super().set_curr_state(state)
+        self.grad_log_target_density_curr_state = None
+
+    def advance(self, active=None):
+        """Move the chains one Metropolis-adjusted Langevin step without recording them in the chain.
+
+        Args:
+            active (np.ndarray): Boolean mask of the chains to move, all chains by default.
+                The target density and its gradient are only evaluated for the active chains, the others stay put.
+        Returns:
+            np.ndarray: Boolean mask of the chains that accepted their proposal.
+        """
+        if self.grad_log_target_density_curr_state is None:
+            self.grad_log_target_density_curr_state = self.target_dist.grad_log_density_batch(self.curr_states)
+        noise = self.noise.next()
+        proposed_states = (self.curr_states + 0.5 * self.vars[:, None] * self.grad_log_target_density_curr_state
+                           + self.proposal.factor(self.vars, self.betas) * noise)
+        log_u = self.log_uniforms.next()
+        if active is None:
+            log_target_density_proposed_states = self.target_dist.log_density_batch(proposed_states)
+            grad_log_target_density_proposed_states = self.target_dist.grad_log_density_batch(proposed_states)
+        else:
+            log_target_density_proposed_states = np.full(self.num_chains, -np.inf)
+            log_target_density_proposed_states[active] = self.target_dist.log_density_batch(proposed_states[active])
+            grad_log_target_density_proposed_states = np.zeros_like(proposed_states)
+            grad_log_target_density_proposed_states[active] = self.target_dist.grad_log_density_batch(proposed_states[active])
+
+        with np.errstate(invalid='ignore'):     # -inf - (-inf) is nan, which is never accepted
+            log_accept_ratios = (self.betas * (log_target_density_proposed_states - self.log_target_density_curr_state)
+                                 + langevin_log_proposal_ratio(self.curr_states, proposed_states, noise,
+                                                               grad_log_target_density_proposed_states, self.vars, self.betas))
+            accepted = (log_accept_ratios > 0) | (log_u < log_accept_ratios)
+        if active is not None:
+            accepted &= active
+
+        self.grad_log_target_density_curr_state = np.where(accepted[:, None], grad_log_target_density_proposed_states,
+                                                           self.grad_log_target_density_curr_state)
+        self.update_states(accepted, proposed_states, log_target_density_proposed_states, active)
+        return accepted
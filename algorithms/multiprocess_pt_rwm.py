@@ -0,0 +1,276 @@
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from interfaces import TargetDistribution
+from algorithms import ParallelTemperingRWM
+
+
+def _available_cpus():
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _attach_shared_arrays(layout):
+    """Attach to the shared memory blocks described by layout, a dict of name -> (block name, shape, dtype)."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+def _worker_loop(connection, layout, rows, engine, random_state):
+    """Main loop of a worker process that owns the replicas (rows) of a multi-process parallel tempering run.
+
+    Args:
+        connection: The worker's end of the pipe to the main process.
+        layout (dict): Shared memory layout, see _attach_shared_arrays.
+        rows (np.ndarray): The replicas owned by this worker.
+        engine (BatchedRandomWalkMH): The engine that advances the replicas, with one row per owned replica
+            (a BatchedRandomWalkMH or BatchedMALA).
+        random_state (tuple or int): State of the worker's random number generator, or a seed.
+    """
+    blocks, shared = _attach_shared_arrays(layout)
+    if isinstance(random_state, tuple):
+        np.random.set_state(random_state)
+    else:
+        np.random.seed(random_state)
+    try:
+        while True:
+            command = connection.recv()
+            if command[0] == "segment":
+                _, num_steps, first_active = command
+                # pick up the swaps and ladder updates made by the main process since the last segment
+                states = shared["states"][rows].copy()
+                if hasattr(engine, 'grad_log_target_density_curr_state') and not np.array_equal(states, engine.curr_states):
+                    engine.grad_log_target_density_curr_state = None    # the main process set new states
+                engine.curr_states = states
+                engine.log_target_density_curr_state = shared["log_densities"][rows].copy()
+                engine.betas = shared["betas"][rows].copy()
+                engine.vars = shared["vars"][rows].copy()
+                for t in range(num_steps):
+                    accepted = engine.advance(first_active if t == 0 else None)
+                    shared["history"][t, rows] = engine.curr_states
+                    shared["history_accepted"][t, rows] = accepted
+                shared["states"][rows] = engine.curr_states
+                shared["log_densities"][rows] = engine.log_target_density_curr_state
+                connection.send(None)
+            elif command[0] == "state":
+                connection.send((engine, np.random.get_state()))
+            elif command[0] == "stop":
+                break
+    finally:
+        for block in blocks:
+            block.close()
+        connection.close()
+
+
+class MultiprocessParallelTemperingRWM(ParallelTemperingRWM):
+    """Parallel tempering with the replicas spread over worker processes.
+
+    The current states, log target densities, inverse temperatures and proposal variances of all
+    replicas live in multiprocessing.shared_memory. Between two swap steps every worker advances its
+    own replicas independently for a whole segment of up to swap_every steps, writing the states of
+    every step into a shared history buffer. At the swap barriers the main process attempts the swaps
+    on the shared arrays, exactly as ParallelTemperingRWM does, and records the chains of the tracked
+    temperatures from the history buffer. The swap statistics, pt_esjd and the cold chain therefore
+    follow the same distribution as in the single-process algorithm, with one random number stream per worker.
+
+    The workers only pay off when a segment does much more work than synchronizing it. Every segment
+    costs a pipe round trip with each worker and a copy of the replica arrays, on the order of a millisecond,
+    while a segment of a worker advances its replicas swap_every steps. For cheap targets such as a
+    low-dimensional Gaussian one segment takes well under a millisecond and ParallelTemperingRWM is faster;
+    aim for at least a few milliseconds of target evaluations per worker per segment (expensive densities,
+    high dimensions or many temperatures per worker). The number of workers is capped at the number of CPUs
+    this process may run on, and when that leaves a single worker the algorithm runs in the main
+    process exactly like ParallelTemperingRWM, without starting any worker.
+
+    The worker processes are started on the first call to run (or step) and stopped with close().
+    Stepping one iteration at a time works but synchronizes the workers on every step; use run(n),
+    which MCMCSimulation does, to let the workers run whole segments.
+    Pickling the algorithm (e.g. for checkpoints) also saves the states of the workers, so a
+    resumed run continues exactly.
+    """
+    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=True, beta_ladder=None,
+                 swap_acceptance_rate=0.234, num_workers=None, **kwargs):
+        """Initialize the multi-process parallel tempering algorithm.
+
+        Args:
+            num_workers (int): Number of worker processes, by default one per temperature.
+                It is capped at the number of temperatures and the number of available CPUs;
+                with a single worker the algorithm runs in the main process.
+            The other arguments are those of ParallelTemperingRWM.
+        """
+        super().__init__(dim, var, target_dist, symmetric, beta_ladder=beta_ladder,
+                         swap_acceptance_rate=swap_acceptance_rate, **kwargs)
+        num_temps = len(self.beta_ladder)
+        if num_workers is None:
+            num_workers = num_temps
+        self.num_workers = max(1, min(num_workers, num_temps, _available_cpus()))
+        self.single_process = self.num_workers == 1     # one worker cannot beat the main process
+        self.worker_rows = np.array_split(np.arange(num_temps), self.num_workers)
+        self._worker_states = None  # engines and random states of stopped workers
+        self._workers = None
+        self._connections = None
+        self._blocks = None
+        self._shared = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._workers is not None:
+            state["_worker_states"] = self._collect_worker_states()
+        # arrays backed by shared memory are pickled by value
+        for key in ("_workers", "_connections", "_blocks", "_shared"):
+            state[key] = None
+        return state
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _collect_worker_states(self):
+        for connection in self._connections:
+            connection.send(("state",))
+        return [connection.recv() for connection in self._connections]
+
+    def _start_workers(self):
+        """Move the replica arrays into shared memory and start the worker processes."""
+        num_temps = len(self.beta_ladder)
+        arrays = {
+            "states": np.asarray(self.engine.curr_states, dtype=float),
+            "log_densities": np.asarray(self.engine.log_target_density_curr_state, dtype=float),
+            "betas": np.asarray(self.engine.betas, dtype=float),
+            "vars": np.asarray(self.engine.vars, dtype=float),
+            "history": np.zeros((self.swap_every, num_temps, self.dim)),
+            "history_accepted": np.zeros((self.swap_every, num_temps), dtype=bool),
+        }
+        self._blocks, self._shared, layout = [], {}, {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            self._blocks.append(block)
+            self._shared[name] = shared
+            layout[name] = (block.name, array.shape, array.dtype.str)
+        # the main process works on the shared arrays directly
+        self.engine.curr_states = self._shared["states"]
+        self.engine.log_target_density_curr_state = self._shared["log_densities"]
+        self.engine.betas = self._shared["betas"]
+        self.engine.vars = self._shared["vars"]
+
+        if self._worker_states is not None:
+            worker_states = self._worker_states
+        else:
+            # new workers get their own engine and a seed drawn from the main random number generator
+            seeds = np.random.randint(0, 2 ** 31 - 1, size=self.num_workers)
+            worker_states = []
+            for rows, seed in zip(self.worker_rows, seeds):
+                engine = type(self.engine)(self.dim, self.var, self.target_dist, self.symmetric, num_chains=len(rows),
+                                             beta=self._shared["betas"][rows], proposal=self.engine.proposal)
+                worker_states.append((engine, int(seed)))
+        self._worker_states = None
+
+        self._workers, self._connections = [], []
+        for rows, (engine, random_state) in zip(self.worker_rows, worker_states):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_worker_loop,
+                                             args=(child_connection, layout, rows, engine, random_state), daemon=True)
+            worker.start()
+            child_connection.close()
+            self._workers.append(worker)
+            self._connections.append(parent_connection)
+
+    def close(self):
+        """Stop the worker processes and move the replica arrays back into the main process.
+        The states of the workers are kept, so running again continues exactly where the run stopped."""
+        if self._workers is None:
+            return
+        self._worker_states = self._collect_worker_states()
+        for connection in self._connections:
+            connection.send(("stop",))
+        for worker in self._workers:
+            worker.join()
+        for connection in self._connections:
+            connection.close()
+        self.engine.curr_states = self._shared["states"].copy()
+        self.engine.log_target_density_curr_state = self._shared["log_densities"].copy()
+        self.engine.betas = self._shared["betas"].copy()
+        self.engine.vars = self._shared["vars"].copy()
+        self._shared = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._workers, self._connections, self._blocks = None, None, None
+
+    def reset(self):
+        """Reset the chains of all temperatures to their initial states and clear the swap statistics."""
+        if self._workers is not None:
+            self.close()
+        super().reset()
+
+    def step(self):
+        """Take one step, see ParallelTemperingRWM.step."""
+        if self.single_process:
+            super().step()
+        else:
+            self.run(1)
+
+    def run(self, num_iterations):
+        """Take num_iterations steps, letting the workers advance their replicas in parallel between swap steps."""
+        if self.single_process:
+            super().run(num_iterations)
+            return
+        if self._workers is None:
+            self._start_workers()
+        history, history_accepted = self._shared["history"], self._shared["history_accepted"]
+        remaining = num_iterations
+        while remaining > 0:
+            start_time = time.perf_counter()
+            first_step = self.step_counter + 1
+            moved, swapped = None, None
+            if first_step % self.swap_every == 0:
+                moved, swapped = self.swap_round()
+            # the segment runs up to the step before the next swap step
+            num_steps = min(remaining, self.swap_every - first_step % self.swap_every)
+            if self.adapting:
+                num_steps = min(num_steps, max(1, self.adaptation_steps - self.step_counter))
+            if self.adapting_proposals:
+                num_steps = min(num_steps, max(1, self.proposal_adaptation_steps - self.step_counter))
+
+            for rows, connection in zip(self.worker_rows, self._connections):
+                connection.send(("segment", num_steps, None if moved is None else moved[rows]))
+            for connection in self._connections:
+                connection.recv()
+
+            # the workers do not record, so bring the counters and chains of the main process up to date
+            accepted_counts = history_accepted[:num_steps].sum(axis=0)
+            proposal_counts = num_steps if moved is None else (num_steps - 1) + moved
+            self.engine.num_steps += num_steps
+            self.engine.num_proposals += proposal_counts
+            self.engine.num_acceptances += accepted_counts
+            self.engine.acceptance_rate = self.engine.num_acceptances / (self.engine.num_proposals + 1)
+            for t in range(num_steps):
+                if t == 0:
+                    self.record_step(history[t], history_accepted[t], moved, swapped)
+                else:
+                    self.record_step(history[t], history_accepted[t])
+            self.step_counter += num_steps
+            remaining -= num_steps
+
+            if self.adapting_proposals:
+                # the replicas keep their temperatures within a segment, so adapt once per segment
+                self.adapt_proposal_scales(accepted_counts[self.replica_of_temp],
+                                           np.broadcast_to(proposal_counts, accepted_counts.shape)[self.replica_of_temp])
+            self.sampling_time += time.perf_counter() - start_time
+            # freezing restarts the round trip statistics, which then only cover the steps after the adaptation
+            if self.adapting and self.step_counter >= self.adaptation_steps:
+                self.freeze_beta_ladder()
+            if self.adapting_proposals and self.step_counter >= self.proposal_adaptation_steps:
+                self.freeze_proposal_scales()
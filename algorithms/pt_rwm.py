@@ -1,12 +1,53 @@
+import os
+import time
 import numpy as np
-from scipy.stats import multivariate_normal as normal
-from interfaces import MHAlgorithm, TargetDistribution
-from algorithms import RandomWalkMH
+from interfaces import MHAlgorithm, TargetDistribution, Chain, StreamingChain, LadderCache, make_chain
+from algorithms import BatchedRandomWalkMH, BatchedMALA
 
 
 class ParallelTemperingRWM(MHAlgorithm):
     """Implementation of the Random Walk Metropolis-Hastings with Parallel Tempering 
-    algorithm for sampling from a target distribution."""
+    algorithm for sampling from a target distribution.
+
+    The current states of all temperatures are held as one (K, dim) array in a BatchedRandomWalkMH
+    engine with one inverse temperature per row, so each step makes one batched proposal,
+    one batched log target density evaluation and one vectorized accept test for all K temperatures.
+    The chain recorded at temperature i is self.chains[i], the cold chain is self.chain.
+    Only the temperatures in record_temps (by default only the cold one) record their full history,
+    the others keep just their current state in the engine and, with stream_other_temps=True,
+    running summaries in a StreamingChain. Their entry in self.chains is None otherwise.
+
+    A swap exchanges the temperatures of two replicas (rows of the engine) rather than their states:
+    replica_of_temp[i] is the row currently at temperature i and temp_of_replica is its inverse,
+    so an accepted swap is an index exchange and every replica keeps its state and cached log density.
+
+    With adapt_ladder=True the interior inverse temperatures are tuned during the first adaptation_steps
+    iterations from the observed swap probabilities of neighbouring pairs, and then frozen. The endpoints
+    and the number of temperatures stay fixed, so the adaptation equalizes the swap rates of all pairs
+    rather than reaching swap_acceptance_rate: the common rate is set by num_temperatures and ladder_beta_min,
+    and swap_acceptance_rate does not affect the adapted ladder. Without a beta_ladder the adaptation
+    starts from num_temperatures geometrically spaced inverse temperatures between 1 and ladder_beta_min,
+    which skips the construction of the ladder altogether.
+
+    With swap_scheme="sequential" the neighbouring pairs attempt to swap one after the other on every swap
+    step and only the hottest chain moves on that step. With swap_scheme="deo" (deterministic even-odd)
+    the swap steps alternate between all even pairs (0, 1), (2, 3), ... and all odd pairs (1, 2), (3, 4), ...,
+    which are attempted simultaneously, and all chains move on every step.
+    Round trips of the replicas from beta = 1 to the hottest temperature and back are counted in
+    num_round_trips, see round_trip_rate; with an adaptive ladder or proposals only the round trips after the
+    adaptation is frozen are counted. With record_index_process=True the temperature of every
+    replica after each swap step is kept in index_process.
+    The swap attempts, acceptances and squared jump distances of every pair (i, i + 1) of neighbouring
+    temperatures are counted in pair_swap_attempts, pair_swap_acceptances and pair_squared_jump_distances.
+
+    Every temperature i proposes with covariance (proposal_vars[i] / beta_i) * C, where proposal_vars
+    starts at var for all temperatures. With adapt_proposals=True the proposal variance of every
+    temperature is tuned during the first proposal_adaptation_steps iterations (by default adaptation_steps)
+    toward target_acceptance_rate within that temperature, and then frozen. The adapted variances are
+    stored with a cached ladder (constructed with a ladder_seed) and reused by later runs with the same ladder.
+
+    With rung_sampler="mala" every temperature moves with a Metropolis-adjusted Langevin step (see BatchedMALA)
+    instead of a Random Walk Metropolis step, which needs the gradient of the log target density."""
     def __init__(
             self, 
             dim, 
@@ -15,9 +56,30 @@ class ParallelTemperingRWM(MHAlgorithm):
             symmetric=True,
             beta_ladder=None,
             geom_temp_spacing=False,
-            swap_acceptance_rate=0.234,):
+            swap_acceptance_rate=0.234,
+            record_temps=(0,),
+            stream_other_temps=False,
+            ladder_seed=None,
+            ladder_cache_dir="data/ladder_cache",
+            adapt_ladder=False,
+            num_temperatures=10,
+            adaptation_steps=10000,
+            swap_scheme="sequential",
+            record_index_process=False,
+            adapt_proposals=False,
+            target_acceptance_rate=0.234,
+            proposal_adaptation_steps=None,
+            rung_sampler="rwm",):
         super().__init__(dim, var, target_dist, symmetric)
         self.name = "PTrwm"
+        self.rung_sampler = rung_sampler
+        if rung_sampler == "rwm":
+            engine_class = BatchedRandomWalkMH
+        elif rung_sampler == "mala":
+            engine_class = BatchedMALA
+            self.name = "PTmala"
+        else:
+            raise ValueError(f"Unknown rung sampler '{rung_sampler}', please use 'rwm' or 'mala'.")
         ### counting variables
         self.num_swap_attempts = 0
         self.num_acceptances = 0    # use this to calculate acceptance rate
@@ -27,52 +89,227 @@ class ParallelTemperingRWM(MHAlgorithm):
         self.squared_jump_distances = 0
         self.pt_esjd = 0
 
-        self.chains = []    # each chain is a separate RandomWalkMH instance
         self.beta_ladder = beta_ladder
         self.ideal_swap_acceptance_rate = swap_acceptance_rate  # only used for constructing the temperature ladder
+        ### settings of the temperature ladder construction
+        self.ladder_beta_min = 1e-2     # the hottest inverse temperature
+        self.ladder_num_samples = 3000  # draws per inverse temperature used to estimate the swap probability
+        self.ladder_tolerance = 0.005   # accepted distance from the ideal swap acceptance rate
+        self.ladder_seed = ladder_seed  # seed of the construction, None to use the global random state (not cached)
+        self.ladder_cache = LadderCache(ladder_cache_dir) if ladder_cache_dir is not None else None
+        self.ladder_cache_key = None        # key and description of the cache entry of the ladder, if any
+        self.cached_ladder_entry = None     # the cache entry the ladder was loaded from, if any
 
-        if self.beta_ladder is not None:
-            for i in range(len(self.beta_ladder)):  # only if the temp ladder is not none
-                self.chains.append(RandomWalkMH(dim, var, target_dist, symmetric, beta=self.beta_ladder[i]))
-
-        else:
+        if self.beta_ladder is None and adapt_ladder:
+            ### start the adaptation from a geometrically spaced ladder with fixed endpoints
+            self.beta_ladder = list(self.ladder_beta_min ** np.linspace(0, 1, num_temperatures))
+        elif self.beta_ladder is None:
             self.beta_ladder = []
             if geom_temp_spacing:
                 ### construct a geometrically spaced inverse temperature ladder
-                beta_0, beta_min = 1, 1e-2
+                beta_0, beta_min = 1, self.ladder_beta_min
                 curr_beta = beta_0
                 c = 0.5     # set the geometric spacing constant
                 while curr_beta > beta_min:
                     self.beta_ladder.append(curr_beta)
-                    # initialize one RWM algorithm for each beta
-                    self.chains.append(RandomWalkMH(dim, var, target_dist, symmetric, beta=self.beta_ladder[-1]))
                     curr_beta = curr_beta * c
                 
                 self.beta_ladder.append(beta_min)
-                self.chains.append(self.chain.copy())
 
             else:
-                ### iteratively construct the inverse temperatures
-                self.construct_beta_ladder_iteratively()
-                    
-        self.chain = self.chains[0].chain  # the first chain is the "cold" chain
-        self.log_target_density_curr_state = np.ones(len(self.beta_ladder)) * -np.inf    # store the previously computed target densities
+                ### iteratively construct the inverse temperatures, or reuse a previously constructed ladder
+                self.load_or_construct_beta_ladder()
+
+        assert self.beta_ladder[0] == 1, "The first chain should have beta = 1."
+
+        ### per-temperature proposal variances, adapted during burn-in toward target_acceptance_rate
+        self.proposal_vars = np.full(len(self.beta_ladder), float(var))
+        self.target_acceptance_rate = target_acceptance_rate
+        self.adapting_proposals = adapt_proposals
+        self.proposal_adaptation_steps = adaptation_steps if proposal_adaptation_steps is None else proposal_adaptation_steps
+        self.num_proposal_adaptations = np.zeros(len(self.beta_ladder), dtype=int)
+
+        # one row of the engine for each replica, replica i starts at temperature i
+        self.engine = engine_class(dim, self.proposal_vars, target_dist, symmetric,
+                                          num_chains=len(self.beta_ladder), beta=np.asarray(self.beta_ladder, dtype=float))
+        if adapt_proposals and self.cached_ladder_entry is not None:
+            ### reuse the variances adapted by an earlier run with the same ladder, proposals and target acceptance rate
+            cached_vars = self.cached_ladder_entry.get("proposal_vars")
+            if (cached_vars is not None and len(cached_vars) == len(self.beta_ladder)
+                    and self.cached_ladder_entry.get("target_acceptance_rate") == float(target_acceptance_rate)
+                    and self.cached_ladder_entry.get("proposal_settings") == self.proposal_settings()):
+                self.proposal_vars = np.asarray(cached_vars, dtype=float)
+                self.engine.vars[:] = self.proposal_vars
+                self.adapting_proposals = False
+                print("Loaded the proposal variances from the cache.")
+                print("Proposal variances: ", [float(var) for var in self.proposal_vars])
+
+        self.replica_of_temp = np.arange(len(self.beta_ladder))
+        self.temp_of_replica = np.arange(len(self.beta_ladder))
+        if 0 not in record_temps:
+            raise ValueError("The cold chain (temperature 0) must be recorded.")
+        self.record_temps = tuple(sorted(record_temps))
+        self.chains = []    # the chain recorded at each temperature
+        for i, state in enumerate(self.engine.curr_states):
+            if i in self.record_temps:
+                self.chains.append(Chain(state))
+            elif stream_other_temps:
+                self.chains.append(StreamingChain(state))
+            else:
+                self.chains.append(None)
+        self.tracked_temps = [i for i, chain in enumerate(self.chains) if chain is not None]
+        self.chain = self.chains[0]  # the first chain is the "cold" chain
+
+        ### swap statistics of each pair (i, i + 1) of neighbouring temperatures
+        self.pair_swap_attempts = np.zeros(len(self.beta_ladder) - 1, dtype=int)
+        self.pair_swap_acceptances = np.zeros(len(self.beta_ladder) - 1, dtype=int)
+        self.pair_squared_jump_distances = np.zeros(len(self.beta_ladder) - 1)
+
+        ### online adaptation of the inverse temperature ladder
+        self.last_swap_probs = np.zeros(len(self.beta_ladder) - 1)    # swap probability of each pair in the last swap round
+        self.adapting = adapt_ladder and len(self.beta_ladder) > 2
+        self.adaptation_steps = adaptation_steps
+        self.num_adaptations = np.zeros(len(self.beta_ladder) - 1, dtype=int)   # adaptation steps of each pair
+        # the gaps log beta_k - log beta_{k+1} are exp(rho_k), rescaled to span log beta_0 - log beta_min
+        ladder = np.asarray(self.beta_ladder, dtype=float)
+        if self.adapting and np.any(np.diff(ladder) >= 0):
+            raise ValueError("The ladder to adapt must be strictly decreasing.")
+        with np.errstate(divide='ignore'):
+            self.log_spacings = np.log(-np.diff(np.log(ladder)))
+
+        if swap_scheme not in ("sequential", "deo"):
+            raise ValueError(f"Unknown swap scheme '{swap_scheme}', please use 'sequential' or 'deo'.")
+        self.swap_scheme = swap_scheme
+        ### round trips of the replicas between the coldest and the hottest temperature
+        self.last_extreme = np.full(len(self.beta_ladder), -1)   # 0 if a replica last visited the cold end, 1 for the hot end
+        self.reset_round_trip_statistics()
+        self.index_process = [] if record_index_process else None
+
+    @property
+    def log_target_density_curr_state(self):
+        """The log target densities of the current states of all temperatures."""
+        return self.engine.log_target_density_curr_state[self.replica_of_temp]
 
     def get_name(self):
         """
         Return the name of the MHAlgorithm as a string.
         """
         return self.name
+
+    def reset(self):
+        """Reset the chains of all temperatures to their initial states and clear the swap statistics."""
+        self.engine.reset()
+        self.engine.betas[:] = self.beta_ladder
+        self.engine.vars[:] = self.proposal_vars
+        self.replica_of_temp = np.arange(len(self.beta_ladder))
+        self.temp_of_replica = np.arange(len(self.beta_ladder))
+        for i in self.tracked_temps:
+            self.chains[i].reset()
+        self.num_swap_attempts = 0
+        self.num_acceptances = 0
+        self.acceptance_rate = 0
+        self.step_counter = 0
+        self.squared_jump_distances = 0
+        self.pt_esjd = 0
+        self.reset_pair_statistics()
+        self.reset_round_trip_statistics()
+        if self.index_process is not None:
+            self.index_process = []
+
+    def get_curr_state(self):
+        """Return the current state of the cold chain."""
+        return self.engine.curr_states[self.replica_of_temp[0]]
+
+    def set_curr_state(self, state):
+        """Set the current state of the cold chain."""
+        self.engine.curr_states[self.replica_of_temp[0]] = state
+        self.chain[-1] = state
+        if hasattr(self.engine, 'grad_log_target_density_curr_state'):  # gradient-based rungs
+            self.engine.grad_log_target_density_curr_state = None
+
+    def set_chain_storage(self, storage, path=None):
+        """Choose how the chain of every recorded temperature is stored before the algorithm is run.
+        With the "memmap" storage the cold chain is written to path and the chain of
+        temperature i to path with a _rung{i} suffix."""
+        if len(self.chain) > 1:
+            raise ValueError("Please set the chain storage before running the algorithm.")
+        for i in self.record_temps:
+            rung_path = path
+            if path is not None and i > 0:
+                stem, extension = os.path.splitext(path)
+                rung_path = f"{stem}_rung{i}{extension}"
+            self.chains[i] = make_chain(storage, self.chains[i][0], path=rung_path)
+        self.chain = self.chains[0]
+
+    def reserve(self, num_iterations):
+        """Preallocate chain storage for num_iterations more steps in every recorded chain."""
+        for i in self.record_temps:
+            chain = self.chains[i]
+            chain.reserve(len(chain) + num_iterations)
     
+    def ladder_settings(self):
+        """Return the settings of the iterative ladder construction, used in the ladder cache key."""
+        return {
+            "beta_min": self.ladder_beta_min,
+            "num_samples": self.ladder_num_samples,
+            "tolerance": self.ladder_tolerance,
+        }
+
+    def proposal_settings(self):
+        """Return the settings of the proposals of the rungs, stored with the adapted proposal variances
+        in the ladder cache. Cached variances are only reused by runs with the same settings."""
+        return {
+            "rung_sampler": self.rung_sampler,
+            "proposal": self.engine.proposal.get_name(),
+        }
+
+    def load_or_construct_beta_ladder(self):
+        """Load the inverse temperature ladder from the ladder cache, or construct it
+        iteratively and store it in the cache.
+
+        Only ladders constructed with a ladder_seed are cached. The construction then uses that seed
+        and the global random state is restored afterwards, so the rest of the run does not depend
+        on whether the ladder came from the cache. Without a ladder_seed the ladder is always constructed
+        from the global random state, which it advances, and the cache is not used."""
+        use_cache = self.ladder_cache is not None and self.ladder_seed is not None
+        if use_cache:
+            key, description = self.ladder_cache.key(self.target_dist, self.dim, self.ideal_swap_acceptance_rate,
+                                                     self.ladder_settings(), self.ladder_seed)
+            self.ladder_cache_key = (key, description)
+            cached_entry = self.ladder_cache.load_entry(key)
+            if cached_entry is not None:
+                self.beta_ladder = cached_entry["beta_ladder"]
+                self.cached_ladder_entry = cached_entry
+                print("Loaded the temperature ladder from the cache.")
+                print("Inverse temperature ladder: ", self.beta_ladder)
+                return
+
+        if self.ladder_seed is not None:
+            random_state = np.random.get_state()
+            np.random.seed(self.ladder_seed)
+        try:
+            self.construct_beta_ladder_iteratively()
+        finally:
+            if self.ladder_seed is not None:
+                np.random.set_state(random_state)
+
+        if use_cache:
+            self.ladder_cache.save(key, self.beta_ladder, description)
+
     def construct_beta_ladder_iteratively(self):
         """Construct the inverse temperature ladder iteratively 
-        using a simulation-based approach."""
-        beta_0, beta_min = 1, 1e-2
+        using a simulation-based approach.
+
+        For every candidate inverse temperature, ladder_num_samples independent draws are made
+        at once with target_dist.draw_sample(beta, size) and their log densities are evaluated in a single
+        log_density_batch call. The draws for the current inverse temperature are reused for all candidates."""
+        beta_0, beta_min = 1, self.ladder_beta_min
         curr_beta = beta_0
+        num_samples = self.ladder_num_samples
 
         while curr_beta > beta_min:
             self.beta_ladder.append(curr_beta)
-            self.chains.append(RandomWalkMH(self.dim, self.var, self.target_dist, self.symmetric, beta=self.beta_ladder[-1]))  # initialize one chain for each temperature
+            curr_log_densities = self.target_dist.log_density_batch(self.target_dist.draw_sample(curr_beta, size=num_samples))
 
             ### Find the next inverse temperature beta
             rho_n = 0.5
@@ -81,41 +318,23 @@ class ParallelTemperingRWM(MHAlgorithm):
 
             while new_beta > beta_min:
                 num_iters += 1
-                curr_beta_chain = self.chain.copy()  # copy an empty chain
-                new_beta_chain = self.chain.copy()  # copy an empty chain
-                chains = [(curr_beta_chain, curr_beta), (new_beta_chain, new_beta)]
-
-                ## get an average swap probability between the two chains by drawing 
-                ## total_iterations samples and calculating the swap probability 
-                ## for each sample
-                burn_in = 0
-                total_iterations = 3000    # set this to a large number.
-                total_samples = total_iterations - burn_in
-                for chain, beta in chains:
-                    for _ in range(total_iterations):
-                        # logic to draw sample is in the target distribution
-                        sample = self.target_dist.draw_sample(beta)     
-                        chain.append(sample)
-                
-                ## then calculate the swap probability between these chains for each sample
-                ## and average them to get an average swap probability
-                avg_swap_prob = np.zeros(total_samples)
-                for i in range(total_samples):
-                    ## stabilizing const is added to avoid log(0)
-                    log_swap_prob = (
-                        curr_beta * np.log(self.target_density(new_beta_chain[burn_in + 1 + i]) + 1e-300) + 
-                        new_beta * np.log(self.target_density(curr_beta_chain[burn_in + 1 + i]) + 1e-300) -
-                        curr_beta * np.log(self.target_density(curr_beta_chain[burn_in + 1 + i]) + 1e-300) -
-                        new_beta * np.log(self.target_density(new_beta_chain[burn_in + 1 + i]) + 1e-300)
-                        )
-                    swap_prob = min(1, np.exp(log_swap_prob))
-                    avg_swap_prob[i] = swap_prob
+                new_log_densities = self.target_dist.log_density_batch(self.target_dist.draw_sample(new_beta, size=num_samples))
 
-                avg_swap_prob = np.mean(avg_swap_prob)
+                ## get an average swap probability between the two temperatures by
+                ## calculating the swap probability for each pair of samples
+                with np.errstate(invalid='ignore', over='ignore'):
+                    log_swap_probs = (
+                        curr_beta * new_log_densities + 
+                        new_beta * curr_log_densities -
+                        curr_beta * curr_log_densities -
+                        new_beta * new_log_densities
+                        )
+                    ## a nan arises when both samples have zero density, never swap in that case
+                    swap_probs = np.where(np.isnan(log_swap_probs), 0, np.exp(np.minimum(log_swap_probs, 0)))
+                avg_swap_prob = np.mean(swap_probs)
 
                 ### if the average swap probability is close to 0.234
-                error = 0.005
-                if abs(self.ideal_swap_acceptance_rate - avg_swap_prob) <= error: 
+                if abs(self.ideal_swap_acceptance_rate - avg_swap_prob) <= self.ladder_tolerance: 
                     curr_beta = new_beta
                     print("new beta added to inverse temperature ladder: ", curr_beta, 
                           "\nSwap probability: ", avg_swap_prob,
@@ -129,7 +348,6 @@ class ParallelTemperingRWM(MHAlgorithm):
                 break
 
         self.beta_ladder.append(beta_min)
-        self.chains.append(RandomWalkMH(self.dim, self.var, self.target_dist, self.symmetric, beta=self.beta_ladder[-1]))
         print("Finished constructing the temperature ladder.")
         print("Inverse temperature ladder: ", self.beta_ladder)
 
@@ -137,49 +355,285 @@ class ParallelTemperingRWM(MHAlgorithm):
     def attempt_swap(self, j, k):
         """Attempt to swap states between two chains based on Metropolis criteria."""
         swap_prob = min(1, np.exp(self.log_swap_prob(j, k)))
+        self.last_swap_probs[j] = swap_prob
         self.num_swap_attempts += 1
+        self.pair_swap_attempts[j] += 1
         if np.random.random() < swap_prob:
-            # swap the states
-            temp = self.chains[k].get_curr_state().copy()
-            self.chains[k].set_curr_state(self.chains[j].get_curr_state().copy())
-            self.chains[j].set_curr_state(temp)
-
-            # swap the log target densities of the current state
-            temp = self.chains[k].log_target_density_curr_state.copy()
-            self.chains[k].log_target_density_curr_state = self.chains[j].log_target_density_curr_state.copy()
-            self.chains[j].log_target_density_curr_state = temp
+            # swap the temperatures of the two replicas, their states and log target densities stay in place
+            replica_j, replica_k = self.replica_of_temp[j], self.replica_of_temp[k]
+            self.replica_of_temp[j], self.replica_of_temp[k] = replica_k, replica_j
+            self.temp_of_replica[replica_j], self.temp_of_replica[replica_k] = k, j
+            self.engine.betas[replica_j], self.engine.betas[replica_k] = self.beta_ladder[k], self.beta_ladder[j]
+            self.engine.vars[replica_j], self.engine.vars[replica_k] = self.proposal_vars[k], self.proposal_vars[j]
 
             self.num_acceptances += 1   # increment the number of SWAP acceptances
             self.acceptance_rate = self.num_acceptances / self.num_swap_attempts
             self.squared_jump_distances += (self.beta_ladder[j] - self.beta_ladder[k]) ** 2
             self.pt_esjd = self.squared_jump_distances / self.num_swap_attempts
+            self.pair_swap_acceptances[j] += 1
+            self.pair_squared_jump_distances[j] += (self.beta_ladder[j] - self.beta_ladder[k]) ** 2
+
+
+    def attempt_swaps_deo(self):
+        """Attempt to swap all even pairs (0, 1), (2, 3), ... on even swap steps and all odd pairs
+        (1, 2), (3, 4), ... on odd swap steps. The pairs are disjoint, so all of them are decided at once.
+
+        Returns:
+            np.ndarray: Boolean mask of the temperatures whose replica changed.
+        """
+        num_temps = len(self.beta_ladder)
+        j = self.deo_pairs()
+        k = j + 1
+        replicas_j, replicas_k = self.replica_of_temp[j], self.replica_of_temp[k]
+        betas = np.asarray(self.beta_ladder, dtype=float)
+        log_swap_probs = self.log_swap_probs(j)
+        with np.errstate(over='ignore'):
+            ## a nan arises when both states have zero density, never swap in that case
+            swap_probs = np.where(np.isnan(log_swap_probs), 0, np.exp(np.minimum(log_swap_probs, 0)))
+        self.last_swap_probs[j] = swap_probs
+        accepted = np.random.random(len(j)) < swap_probs
+        self.pair_swap_attempts[j] += 1
+        self.pair_swap_acceptances[j] += accepted
+        self.pair_squared_jump_distances[j] += np.where(accepted, (betas[j] - betas[k]) ** 2, 0)
+
+        # exchange the temperatures of the replicas of every accepted pair
+        j, k = j[accepted], k[accepted]
+        replicas_j, replicas_k = replicas_j[accepted], replicas_k[accepted]
+        self.replica_of_temp[j], self.replica_of_temp[k] = replicas_k, replicas_j
+        self.temp_of_replica[replicas_j], self.temp_of_replica[replicas_k] = k, j
+        self.engine.betas[replicas_j], self.engine.betas[replicas_k] = betas[k], betas[j]
+        self.engine.vars[replicas_j], self.engine.vars[replicas_k] = self.proposal_vars[k], self.proposal_vars[j]
+
+        self.num_swap_attempts += len(accepted)
+        self.num_acceptances += len(j)
+        self.squared_jump_distances += np.sum((betas[j] - betas[k]) ** 2)
+        if self.num_swap_attempts > 0:
+            self.acceptance_rate = self.num_acceptances / self.num_swap_attempts
+            self.pt_esjd = self.squared_jump_distances / self.num_swap_attempts
+        swapped = np.zeros(num_temps, dtype=bool)
+        swapped[j] = swapped[k] = True
+        return swapped
+
+    def deo_pairs(self):
+        """Return the pairs (j, j + 1) attempted by the DEO scheme on the current swap step, by their index j."""
+        parity = (self.step_counter // self.swap_every) % 2
+        return np.arange(parity, len(self.beta_ladder) - 1, 2)
+
+    def reset_round_trip_statistics(self):
+        """Restart counting round trips, and the steps and sampling time they are rated over, from the current replicas."""
+        self.last_extreme[:] = -1
+        self.last_extreme[self.replica_of_temp[-1]] = 1
+        self.last_extreme[self.replica_of_temp[0]] = 0
+        self.num_round_trips = 0
+        self.round_trip_start_step = self.step_counter
+        self.sampling_time = 0.0    # seconds spent in step, for round trips per second
 
+    def update_round_trips(self):
+        """Update the round trip counts after a swap step. A round trip is completed when a replica
+        reaches the cold end after having visited the hot end."""
+        cold_replica, hot_replica = self.replica_of_temp[0], self.replica_of_temp[-1]
+        if self.last_extreme[cold_replica] == 1:
+            self.num_round_trips += 1
+        self.last_extreme[cold_replica] = 0
+        self.last_extreme[hot_replica] = 1
+        if self.index_process is not None:
+            self.index_process.append(self.temp_of_replica.copy())
+
+    def round_trip_rate(self, per_second=False):
+        """Return the number of round trips per iteration, or per second spent in step,
+        counted since the adaptation of the ladder and the proposals was frozen."""
+        if per_second:
+            return self.num_round_trips / self.sampling_time if self.sampling_time > 0 else 0.0
+        num_steps = self.step_counter - self.round_trip_start_step
+        return self.num_round_trips / num_steps if num_steps > 0 else 0.0
+
+    def get_index_process(self):
+        """Return the temperature of every replica after each swap step as a (num_swap_steps, K) array."""
+        if self.index_process is None:
+            raise ValueError("Please set record_index_process=True to record the index process.")
+        return np.array(self.index_process, dtype=int).reshape(-1, len(self.beta_ladder))
 
     def log_swap_prob(self, j, k):
         """Calculate the log probability of swapping states between chain j and chain k."""
+        log_density_j = self.engine.log_target_density_curr_state[self.replica_of_temp[j]]
+        log_density_k = self.engine.log_target_density_curr_state[self.replica_of_temp[k]]
         log_prob = (
-            self.beta_ladder[j] * self.chains[k].log_target_density_curr_state + 
-            self.beta_ladder[k] * self.chains[j].log_target_density_curr_state -
-            self.beta_ladder[j] * self.chains[j].log_target_density_curr_state -
-            self.beta_ladder[k] * self.chains[k].log_target_density_curr_state
+            self.beta_ladder[j] * log_density_k + 
+            self.beta_ladder[k] * log_density_j -
+            self.beta_ladder[j] * log_density_j -
+            self.beta_ladder[k] * log_density_k
                 )
         return log_prob
-    
+
+    def log_swap_probs(self, pairs=None):
+        """Return the log probabilities of swapping the states of the neighbouring temperatures (i, i + 1)
+        for all i in pairs (all K - 1 pairs by default), computed at once from the inverse temperatures
+        and the log target densities of the current states."""
+        betas = np.asarray(self.beta_ladder, dtype=float)
+        log_densities = self.log_target_density_curr_state     # ordered by temperature
+        j = np.arange(len(betas) - 1) if pairs is None else np.asarray(pairs)
+        k = j + 1
+        with np.errstate(invalid='ignore', over='ignore'):  # nan when both states have zero density
+            return (
+                betas[j] * log_densities[k] +
+                betas[k] * log_densities[j] -
+                betas[j] * log_densities[j] -
+                betas[k] * log_densities[k]
+                )
+
+    def reset_pair_statistics(self):
+        """Clear the swap statistics of the pairs of neighbouring temperatures."""
+        self.pair_swap_attempts[:] = 0
+        self.pair_swap_acceptances[:] = 0
+        self.pair_squared_jump_distances[:] = 0
+
+    def pair_acceptance_rates(self):
+        """Return the swap acceptance rate of each pair (i, i + 1) of neighbouring temperatures."""
+        return self.pair_swap_acceptances / np.maximum(self.pair_swap_attempts, 1)
+
+    def pair_expected_squared_jump_distances(self):
+        """Return the expected squared jump distance of the inverse temperature for each pair (i, i + 1),
+        the low values show where the ladder is the bottleneck."""
+        return self.pair_squared_jump_distances / np.maximum(self.pair_swap_attempts, 1)
+
+
+    def adapt_beta_ladder(self, pairs):
+        """Move the interior inverse temperatures toward equal swap rates of all pairs using the
+        swap probabilities of the pairs attempted in the last swap round, with the Robbins-Monro recurrence
+        rho_k <- rho_k + (alpha_k - mean alpha) / n_k^0.6 on the log gaps of the pairs, where the mean is
+        over the attempted pairs. The gaps exp(rho_k) are rescaled to span log beta_0 - log beta_min, so the
+        endpoints stay fixed, the ladder stays strictly decreasing and a pair that swaps more often than the
+        others widens at their expense.
+
+        Args:
+            pairs (np.ndarray): The pairs (k, k + 1) attempted in the last swap round, by their index k.
+        """
+        self.num_adaptations[pairs] += 1
+        swap_probs = self.last_swap_probs[pairs]
+        self.log_spacings[pairs] += (swap_probs - np.mean(swap_probs)) / (self.num_adaptations[pairs] ** 0.6)
+        self.log_spacings -= np.mean(self.log_spacings)     # only the relative gaps matter
+        gaps = np.exp(self.log_spacings)
+        log_beta_max, log_beta_min = np.log(self.beta_ladder[0]), np.log(self.beta_ladder[-1])
+        log_betas = log_beta_max + (log_beta_min - log_beta_max) * np.cumsum(gaps)[:-1] / np.sum(gaps)
+        betas = [self.beta_ladder[0], *np.exp(log_betas), self.beta_ladder[-1]]
+        self.beta_ladder = [float(beta) for beta in betas]
+        self.engine.betas[self.replica_of_temp] = self.beta_ladder
+
+    def freeze_beta_ladder(self):
+        """Stop adapting the inverse temperature ladder and restart the swap and round trip statistics,
+        so that they describe the run with the final ladder."""
+        self.adapting = False
+        self.num_swap_attempts = 0
+        self.num_acceptances = 0
+        self.acceptance_rate = 0
+        self.squared_jump_distances = 0
+        self.pt_esjd = 0
+        self.reset_pair_statistics()
+        self.reset_round_trip_statistics()
+        print("Finished adapting the temperature ladder.")
+        print("Inverse temperature ladder: ", self.beta_ladder)
+
+    def adapt_proposal_scales(self, num_accepted, num_proposed):
+        """Move the proposal variance of every temperature toward the target acceptance rate with the
+        Robbins-Monro recurrence log s_i <- log s_i + (a_i - target) / n_i^0.6, where a_i is the acceptance
+        rate of temperature i since the last update and n_i its number of updates.
+
+        Args:
+            num_accepted (np.ndarray): Number of accepted proposals of each temperature since the last update.
+            num_proposed (np.ndarray): Number of proposals of each temperature since the last update.
+        """
+        proposed = num_proposed > 0
+        self.num_proposal_adaptations += proposed
+        gains = np.where(proposed, np.maximum(self.num_proposal_adaptations, 1) ** -0.6, 0)
+        rates = num_accepted / np.maximum(num_proposed, 1)
+        self.proposal_vars = self.proposal_vars * np.exp(gains * (rates - self.target_acceptance_rate))
+        self.engine.vars[self.replica_of_temp] = self.proposal_vars
+
+    def freeze_proposal_scales(self):
+        """Stop adapting the proposal variances, restart the round trip statistics
+        and store the variances with the cached ladder, if any."""
+        self.adapting_proposals = False
+        self.reset_round_trip_statistics()
+        print("Finished adapting the proposal variances.")
+        print("Inverse temperature ladder: ", self.beta_ladder)
+        print("Proposal variances: ", [float(var) for var in self.proposal_vars])
+        if self.ladder_cache is not None and self.ladder_cache_key is not None:
+            key, description = self.ladder_cache_key
+            self.ladder_cache.save(key, self.beta_ladder, description, proposal_vars=self.proposal_vars,
+                                   target_acceptance_rate=self.target_acceptance_rate,
+                                   proposal_settings=self.proposal_settings())
+
+    def swap_round(self):
+        """Attempt the swaps of a swap step and update the round trips and the adaptive ladder.
+
+        Returns:
+            tuple: Boolean mask of the replicas that move on this step (None if all of them move)
+                and Boolean mask of the temperatures whose replica changed (None for the sequential scheme,
+                where the chains record a swap by overwriting their last state).
+        """
+        moved, swapped = None, None
+        if self.swap_scheme == "deo":
+            pairs = self.deo_pairs()
+            swapped = self.attempt_swaps_deo()
+        else:
+            pairs = np.arange(len(self.chains) - 1)
+            replicas_before = self.replica_of_temp.copy()
+            for i in range(len(self.chains) - 1):
+                self.attempt_swap(i, i+1)   # this handles swap acceptance rate as well
+            # a tracked temperature whose replica changed records the swap by overwriting its last state,
+            # once per round however many swaps the state went through
+            for i in self.tracked_temps:
+                if self.replica_of_temp[i] != replicas_before[i]:
+                    self.chains[i][-1] = self.engine.curr_states[self.replica_of_temp[i]]
+            moved = self.temp_of_replica == len(self.chains) - 1    # only the replica at the hottest temperature
+        self.update_round_trips()
+        if self.adapting:
+            self.adapt_beta_ladder(pairs)
+        return moved, swapped
+
+    def record_step(self, states, accepted, moved=None, swapped=None):
+        """Record one step in the chains of the tracked temperatures.
+
+        Args:
+            states (np.ndarray): The (K, dim) states of the replicas after the step.
+            accepted (np.ndarray): Boolean mask of the replicas that accepted their proposal.
+            moved (np.ndarray): Boolean mask of the replicas that moved, None if all of them did.
+            swapped (np.ndarray): Boolean mask of the temperatures whose replica changed in a DEO swap step.
+        """
+        temps = self.tracked_temps if moved is None else [len(self.chains) - 1]
+        for i in temps:
+            if self.chains[i] is None:
+                continue
+            replica = self.replica_of_temp[i]
+            if accepted[replica] or (swapped is not None and swapped[i]):
+                self.chains[i].append(states[replica])
+            else:
+                self.chains[i].repeat_last()
 
     def step(self):
         """Take a step for each chain. Swap states between chains every swap_every steps.
+        With the sequential swap scheme the pairs of neighbouring temperatures attempt to swap in turn
+        on a swap step and only the hottest chain takes a Random Walk Metropolis step.
+        With the DEO swap scheme the even or odd pairs attempt to swap at once and then all chains move.
         """
+        start_time = time.perf_counter()
         self.step_counter += 1
         swap = (self.step_counter % self.swap_every == 0)   # swap is a Boolean value
 
-        for i in range(len(self.chains)):
-            curr_chain = self.chains[i]
-            # swap = False
-            if swap and i < len(self.chains) - 1:
-                self.attempt_swap(i, i+1)   # this handles swap acceptance rate as well
-            else:
-                curr_chain.step()   # handled in the RandomWalkMH instance
-        
-        assert self.chains[0].beta == 1, "The first chain should have beta = 1."
-        self.chain = self.chains[0].chain
-       
\ No newline at end of file
+        moved, swapped = None, None
+        if swap:
+            moved, swapped = self.swap_round()
+
+        # one vectorized Random Walk Metropolis step for all moving replicas
+        accepted = self.engine.advance(moved)
+        self.record_step(self.engine.curr_states, accepted, moved, swapped)
+
+        if self.adapting_proposals:
+            num_proposed = np.ones(len(self.chains), dtype=int) if moved is None else moved[self.replica_of_temp]
+            self.adapt_proposal_scales(accepted[self.replica_of_temp], num_proposed)
+        self.sampling_time += time.perf_counter() - start_time
+        # freezing restarts the round trip statistics, which then only cover the steps after the adaptation
+        if self.adapting and self.step_counter >= self.adaptation_steps:
+            self.freeze_beta_ladder()
+        if self.adapting_proposals and self.step_counter >= self.proposal_adaptation_steps:
+            self.freeze_proposal_scales()
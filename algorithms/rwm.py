@@ -1,13 +1,22 @@
 import numpy as np
-from scipy.stats import multivariate_normal as normal
-from interfaces import MHAlgorithm, TargetDistribution
+from interfaces import MHAlgorithm, TargetDistribution, ProposalDistribution, RandomBuffer, log_uniform, default_block_size
+from proposal_distributions import IsotropicGaussianProposal
 
 class RandomWalkMH(MHAlgorithm):
     """Implementation of the Random Walk Metropolis-Hastings algorithm for sampling from a target distribution."""
-    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=True, beta=1.0, beta_ladder=None, swap_acceptance_rate=None):
+    def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=True, beta=1.0, beta_ladder=None, swap_acceptance_rate=None,
+                 proposal: ProposalDistribution = None, block_size=None):
         """Initialize the RandomWalkMH algorithm. Note: the beta_ladder and swap_acceptance_rate are not used in this implementation,
-        this is due to higher-level code that uses the same interface for different algorithms."""
+        this is due to higher-level code that uses the same interface for different algorithms.
+        The proposal kernel defaults to an isotropic Gaussian with covariance (var / beta) * I.
+        The proposal noise and the accept test uniforms are drawn block_size steps at a time,
+        by default DEFAULT_BLOCK_SIZE steps bounded by the buffer memory (see default_block_size)."""
         super().__init__(dim, var, target_dist, symmetric)
+        if block_size is None:
+            block_size = default_block_size(dim)
+        self.proposal = proposal if proposal is not None else IsotropicGaussianProposal(dim)
+        self.noise = RandomBuffer(self.proposal.sample_noise, block_size=block_size)
+        self.log_uniforms = RandomBuffer(log_uniform, block_size=block_size)
         self.num_acceptances = 0    # use this to calculate acceptance rate
         self.acceptance_rate = 0
         self.log_target_density_curr_state = -np.inf    # this is the log density of the current state, used to reduce redundant computation
@@ -24,18 +33,19 @@ class RandomWalkMH(MHAlgorithm):
         """Take a step using the Random Walk Metropolis-Hastings algorithm.
         Add the new state to the chain with probability min(1, A) where A is the acceptance probability.
         """
-        # np.eye(self.dim) * (self.var) is the covariance matrix, 
-        proposed_state = np.random.multivariate_normal(self.chain[-1], (self.var / self.beta) * np.eye(self.dim))
+        # the proposal kernel caches the factor of its covariance for the current (var, beta)
+        proposed_state = self.proposal.propose(self.chain[-1], self.noise.next(), self.var, self.beta)
+        log_u = self.log_uniforms.next()
     
         log_accept_ratio, log_target_density_proposed_state = self.log_accept_prob(proposed_state, self.log_target_density_curr_state, self.chain[-1])
         # accept the proposed state with probability min(1, A)
-        if log_accept_ratio > 0 or np.random.random() < np.exp(log_accept_ratio):
+        if log_accept_ratio > 0 or log_u < log_accept_ratio:
             self.chain.append(proposed_state)
             self.log_target_density_curr_state = log_target_density_proposed_state
             self.num_acceptances += 1
             self.acceptance_rate = self.num_acceptances / len(self.chain)
         else:
-            self.chain.append(self.chain[-1])
+            self.chain.repeat_last()
             self.acceptance_rate = self.num_acceptances / len(self.chain)
 
     def log_accept_prob(self, proposed_state, log_target_density_curr_state, current_state):
@@ -49,18 +59,13 @@ class RandomWalkMH(MHAlgorithm):
             
         Returns:
             float: The log acceptance probability."""
-        target_density_proposed = self.target_density(proposed_state)
-        log_target_density_proposed_state = -np.inf
-        if target_density_proposed != 0:
-            log_target_density_proposed_state = np.log(target_density_proposed + 1e-300) # for numerical stability
+        log_target_density_proposed_state = self.log_target_density(proposed_state)
 
         if self.symmetric:
             return self.beta * (log_target_density_proposed_state - log_target_density_curr_state), log_target_density_proposed_state
         else:
             log_target_term = self.beta * (log_target_density_proposed_state - log_target_density_curr_state)
-            log_proposal_term = (np.log(normal.pdf(current_state, mean=proposed_state, 
-                                                   cov=np.eye(self.dim) * (self.var))) 
-                                - np.log(normal.pdf(proposed_state, mean=current_state, 
-                                                    cov=np.eye(self.dim) * (self.var))))
+            # closed-form Hastings correction from the proposal kernel, exactly zero for symmetric kernels
+            log_proposal_term = self.proposal.log_proposal_ratio(current_state, proposed_state, self.var, self.beta)
 
             return log_target_term + log_proposal_term, log_target_density_proposed_state
@@ -15,6 +15,7 @@ if __name__ == "__main__":
     dim = 20    # dimension of the target and proposal distributions
     
     ### Reuse some beta ladder if you would like to save time
+    ### (constructed ladders are also cached in data/ladder_cache and reused automatically)
     # temp_beta_ladder = [1, 0.7201258143345616, 0.5351535500164732, 0.40699808631201695, 0.31168319620186075, 0.23789880207916622, 0.1726209665306218, 0.117096477032898, 0.07923549613447455, 0.01]
     
     ### choose the rough carpet or three mixture or standard multivariate normal
@@ -5,6 +5,7 @@ import numpy as np
 from target_distributions import *
 import matplotlib.pyplot as plt
 import json
+import tqdm
 
 def get_target_distribution(name, dim):
     if name == "MultivariateNormal":
@@ -43,31 +44,28 @@ if __name__ == "__main__":
     num_iters = args.num_iters
     target_distribution = get_target_distribution(args.target, dim)
     
-    acceptance_rates = []
-    expected_squared_jump_distances = []
+    ### all variance values are run together as independent chains of one batched engine,
+    ### one batched simulation per seed
+    variances = (var_value_range ** 2) / (dim ** (1))
+    seed_results_acceptance = []
+    seed_results_esjd = []
 
-    for i in range(len(var_value_range)):
-        var = var_value_range[i]
-        print(f"{target_distribution.get_name()} (d={dim}): Variance {i + 1} out of {len(var_value_range)}")
-        variance = (var ** 2) / (dim ** (1))
-        seed_results_acceptance = []
-        seed_results_esjd = []
+    for seed_val in range(args.init_seed, args.init_seed + num_seeds):
+        print(f"{target_distribution.get_name()} (d={dim}): Seed {seed_val - args.init_seed + 1} out of {num_seeds}")
+        np.random.seed(seed_val)
+        engine = BatchedRandomWalkMH(dim,
+                                     variances,
+                                     target_distribution,
+                                     symmetric=True,
+                                     num_chains=len(variances))
+        engine.set_chain_storage("streaming")   # only the acceptance rate and ESJD are needed
+        for _ in tqdm.tqdm(range(num_iters), desc="Running MCMC", unit="iteration"):
+            engine.step()
+        seed_results_acceptance.append(engine.acceptance_rate)
+        seed_results_esjd.append(engine.expected_squared_jump_distance())
 
-        for seed_val in range(args.init_seed, args.init_seed + num_seeds):
-            simulation = MCMCSimulation(dim=dim, 
-                                        sigma=variance,
-                                        num_iterations=num_iters,
-                                        algorithm=RandomWalkMH,
-                                        target_dist=target_distribution,
-                                        symmetric=True,
-                                        seed=seed_val)
-            
-            chain = simulation.generate_samples()
-            seed_results_acceptance.append(simulation.acceptance_rate())
-            seed_results_esjd.append(simulation.expected_squared_jump_distance())
-
-        acceptance_rates.append(np.mean(seed_results_acceptance))
-        expected_squared_jump_distances.append(np.mean(seed_results_esjd))
+    acceptance_rates = np.mean(seed_results_acceptance, axis=0).tolist()
+    expected_squared_jump_distances = np.mean(seed_results_esjd, axis=0).tolist()
 
     max_esjd = max(expected_squared_jump_distances)
     max_esjd_index = np.argmax(expected_squared_jump_distances)
@@ -1,4 +1,6 @@
 import argparse
+import functools
+import os
 from interfaces import MCMCSimulation
 from algorithms import *
 import numpy as np
@@ -16,6 +18,10 @@ def get_target_distribution(name, dim):
     else:
         raise ValueError("Unknown target distribution name")
 
+def pair_statistics(algorithm):
+    """Return the swap attempts, acceptances and squared jump distances of each pair of neighbouring temperatures."""
+    return np.array([algorithm.pair_swap_attempts, algorithm.pair_swap_acceptances, algorithm.pair_squared_jump_distances])
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run Parallel Tempering simulations with various parameters")
     parser.add_argument("--dim", type=int, default=20, help="Dimension of the target and proposal distributions")
@@ -24,6 +30,13 @@ if __name__ == "__main__":
     parser.add_argument("--num_iters", type=int, default=100000, help="Number of iterations for the MCMC simulation")
     parser.add_argument("--init_seed", type=int, default=0, help="Starting seed value")
     parser.add_argument("--num_seeds", type=int, default=5, help="Number of seeds to use in the simulations")
+    parser.add_argument("--adapt_ladder", type=int, default=None, help="Adapt a ladder of this many temperatures during the first tenth of each run instead of constructing it beforehand. The adaptation equalizes the swap rates of the pairs, so the swap acceptance rate does not affect it")
+    parser.add_argument("--swap_scheme", type=str, default="sequential", help="Swap scheme of parallel tempering: sequential or deo (deterministic even-odd)")
+    parser.add_argument("--adapt_proposals", action="store_true", help="Adapt the proposal variance of every temperature during the first tenth of each run")
+    parser.add_argument("--ladder_seed", type=int, default=0, help="Seed of the construction of the temperature ladders, which are cached in data/ladder_cache")
+    parser.add_argument("--rung_sampler", type=str, default="rwm", help="Sampler of every temperature: rwm or mala")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of worker processes the temperatures are spread over, 1 to run each simulation in a single process")
+    parser.add_argument("--checkpoint_every", type=int, default=None, help="Checkpoint each run every this many iterations and resume runs from existing checkpoints")
 
     args = parser.parse_args()
 
@@ -32,22 +45,53 @@ if __name__ == "__main__":
     num_seeds = args.num_seeds
     num_iters = args.num_iters
     target_distribution = get_target_distribution(args.target, dim)
+    algorithm_options = {"swap_scheme": args.swap_scheme, "rung_sampler": args.rung_sampler, "ladder_seed": args.ladder_seed}
+    if args.adapt_ladder is not None:
+        algorithm_options.update(adapt_ladder=True, num_temperatures=args.adapt_ladder, adaptation_steps=num_iters // 10)
+    if args.adapt_proposals:
+        algorithm_options.update(adapt_proposals=True, proposal_adaptation_steps=num_iters // 10)
+    if args.num_workers > 1:
+        algorithm = functools.partial(MultiprocessParallelTemperingRWM, num_workers=args.num_workers, **algorithm_options)
+    else:
+        algorithm = functools.partial(ParallelTemperingRWM, **algorithm_options)
+    algorithm_name = f"PT{args.rung_sampler}"     # PTrwm or PTmala, as in ParallelTemperingRWM.get_name
 
     acceptance_rates = []
     expected_squared_jump_distances = []
+    round_trip_rates = []   # round trips per second of sampling, after the adaptation if any
+    beta_ladders = []       # the ladder and the adapted proposal variances of the last seed of each spacing
+    proposal_vars = []
+    pair_swap_attempts = []     # swap statistics of each pair of neighbouring temperatures, summed over the seeds
+    pair_swap_acceptances = []
+    pair_squared_jump_distances = []
 
     for i in range(len(swap_acceptance_rates_range)):
         a = swap_acceptance_rates_range[i]
         print(f"{target_distribution.get_name()} dim{dim}: Temperature spacing {i + 1} out of {len(swap_acceptance_rates_range)}")
         seed_results_acceptance = []
         seed_results_esjd = []
+        seed_results_round_trips = []
+        seed_results_pairs = []
         constructed_beta_ladder = None
 
         for seed_val in range(args.init_seed, args.init_seed + num_seeds):
+            checkpoint_path = None
+            if args.checkpoint_every is not None:
+                checkpoint_path = f"data/checkpoints/{target_distribution.get_name()}_{algorithm_name}_dim{dim}_spacing{i}_seed{seed_val}_{num_iters}iters.pkl"
+            if checkpoint_path is not None and os.path.exists(checkpoint_path):
+                # continue (or reuse) an interrupted run, including its beta ladder
+                simulation = MCMCSimulation.resume(checkpoint_path, args.checkpoint_every)
+                constructed_beta_ladder = simulation.algorithm.beta_ladder
+                seed_results_acceptance.append(simulation.acceptance_rate())
+                seed_results_esjd.append(simulation.pt_expected_squared_jump_distance())
+                seed_results_round_trips.append(simulation.algorithm.round_trip_rate(per_second=True))
+                seed_results_pairs.append(pair_statistics(simulation.algorithm))
+                continue
+
             simulation = MCMCSimulation(dim=dim, 
                                         sigma=((2.38 ** 2) / (dim ** (1))),  # 2.38**2 / dim
                                         num_iterations=num_iters,
-                                        algorithm=ParallelTemperingRWM,
+                                        algorithm=algorithm,
                                         target_dist=target_distribution,
                                         symmetric=True,  # whether to do Metropolis or Metropolis-Hastings: symmetric proposal distribution
                                         seed=seed_val,
@@ -55,12 +99,22 @@ if __name__ == "__main__":
                                         swap_acceptance_rate=a)
             constructed_beta_ladder = simulation.algorithm.beta_ladder
             
-            chain = simulation.generate_samples()
+            chain = simulation.generate_samples(checkpoint_path, args.checkpoint_every)
             seed_results_acceptance.append(simulation.acceptance_rate())
             seed_results_esjd.append(simulation.pt_expected_squared_jump_distance())
+            seed_results_round_trips.append(simulation.algorithm.round_trip_rate(per_second=True))
+            seed_results_pairs.append(pair_statistics(simulation.algorithm))
 
         acceptance_rates.append(np.mean(seed_results_acceptance))
         expected_squared_jump_distances.append(np.mean(seed_results_esjd))
+        round_trip_rates.append(np.mean(seed_results_round_trips))
+        beta_ladders.append([float(beta) for beta in simulation.algorithm.beta_ladder])
+        proposal_vars.append([float(var) for var in simulation.algorithm.proposal_vars])
+        # every seed of a spacing uses the same number of temperatures
+        attempts, acceptances, squared_jumps = np.sum(seed_results_pairs, axis=0)
+        pair_swap_attempts.append(attempts.astype(int).tolist())
+        pair_swap_acceptances.append(acceptances.astype(int).tolist())
+        pair_squared_jump_distances.append(squared_jumps.tolist())
 
     max_esjd = max(expected_squared_jump_distances)
     max_esjd_index = np.argmax(expected_squared_jump_distances)
@@ -77,9 +131,18 @@ if __name__ == "__main__":
         'max_constr_acceptance_rate': max_constr_acceptance_rate,
         'expected_squared_jump_distances': expected_squared_jump_distances,
         'acceptance_rates': acceptance_rates,
+        'round_trip_rates': round_trip_rates,
+        'pair_swap_attempts': pair_swap_attempts,
+        'pair_swap_acceptances': pair_swap_acceptances,
+        'pair_squared_jump_distances': pair_squared_jump_distances,
+        'pair_acceptance_rates': [(np.array(accepts) / np.maximum(attempts, 1)).tolist()
+                                  for accepts, attempts in zip(pair_swap_acceptances, pair_swap_attempts)],
         'swap_acceptance_rates_range': swap_acceptance_rates_range.tolist()
     }
-    with open(f"data/{target_distribution.get_name()}_PTrwm_dim{dim}_seed{args.init_seed}_{num_iters}iters.json", "w") as file:
+    if args.adapt_proposals:
+        data['beta_ladders'] = beta_ladders
+        data['proposal_vars'] = proposal_vars
+    with open(f"data/{target_distribution.get_name()}_{algorithm_name}_dim{dim}_seed{args.init_seed}_{num_iters}iters.json", "w") as file:
         json.dump(data, file)
 
 
@@ -88,7 +151,7 @@ if __name__ == "__main__":
     plt.xlabel('swap acceptance rate (construction)')
     plt.ylabel('ESJD')
     plt.title(f'ESJD vs swap acceptance rate (dim={dim})')
-    filename = f"images/ESJDvsSwapAcceptConstr_{target_distribution.get_name()}_PTrwm_dim{dim}_seed{args.init_seed}_{num_iters}iters"
+    filename = f"images/ESJDvsSwapAcceptConstr_{target_distribution.get_name()}_{algorithm_name}_dim{dim}_seed{args.init_seed}_{num_iters}iters"
     plt.savefig(filename)
     plt.clf()
     plt.close()
@@ -99,7 +162,7 @@ if __name__ == "__main__":
     plt.xlabel('swap acceptance rate (actual)')
     plt.ylabel('ESJD')
     plt.title(f'ESJD vs swap acceptance rate (dim={dim})')
-    filename = f"images/ESJDvsSwapAcceptActual_{target_distribution.get_name()}_PTrwm_dim{dim}_seed{args.init_seed}_{num_iters}iters"
+    filename = f"images/ESJDvsSwapAcceptActual_{target_distribution.get_name()}_{algorithm_name}_dim{dim}_seed{args.init_seed}_{num_iters}iters"
     plt.savefig(filename, dpi=300, bbox_inches='tight')
     plt.clf()
     plt.close()
@@ -1,3 +1,7 @@
+from .chain import Chain, MemmapChain, RunLengthChain, StreamingChain, make_chain
+from .ladder_cache import LadderCache, target_fingerprint
 from .metropolis import MHAlgorithm
+from .proposal import ProposalDistribution
+from .random_buffer import RandomBuffer, log_uniform, default_block_size, DEFAULT_BLOCK_SIZE, DEFAULT_BUFFER_ELEMENTS
 from .simulation import MCMCSimulation
-from .target import TargetDistribution
\ No newline at end of file
+from .target import TargetDistribution
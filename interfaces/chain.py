@@ -0,0 +1,509 @@
+import json
+import os
+import numpy as np
+
+
+class Chain:
+    """Storage for the states of a Markov chain backed by a preallocated ndarray.
+
+    States are written into the rows of a (capacity, *state_shape) array instead of being
+    appended to a list as separate ndarrays. When the capacity is exhausted the array grows
+    geometrically, so appending stays amortized O(1).
+    Indexing, len() and iteration behave like the list of states this replaces, and
+    np.asarray(chain) returns a zero-copy view of the recorded states.
+    """
+    growth_factor = 2
+
+    def __init__(self, initial_state, capacity=1):
+        """Initialize the chain with its initial state.
+
+        Args:
+            initial_state (np.ndarray): The first state of the chain. Its shape is the shape of every state.
+            capacity (int): Number of states to preallocate room for.
+        """
+        initial_state = np.asarray(initial_state, dtype=float)
+        self.state_shape = initial_state.shape
+        self._data = np.empty((max(capacity, 1),) + self.state_shape)
+        self._data[0] = initial_state
+        self._length = 1
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index == -1:     # fast path for the current state
+            return self._data[self._length - 1]
+        return self._data[:self._length][index]
+
+    def __setitem__(self, index, state):
+        if isinstance(index, int) and index == -1:
+            self._data[self._length - 1] = state
+        else:
+            self._data[:self._length][index] = state
+
+    def __iter__(self):
+        return iter(self._data[:self._length])
+
+    def __getstate__(self):
+        # pickle only the recorded states, not the preallocated tail, e.g. for checkpoints
+        state = self.__dict__.copy()
+        state["_capacity"] = len(state["_data"])
+        state["_data"] = state["_data"][:self._length]
+        return state
+
+    def __setstate__(self, state):
+        capacity = state.pop("_capacity")
+        self.__dict__.update(state)
+        self._resize(capacity)
+
+    def __array__(self, dtype=None, copy=None):
+        states = self._data[:self._length]
+        if dtype is not None:
+            states = states.astype(dtype, copy=False)
+        return states.copy() if copy else states
+
+    def view(self):
+        """Return a zero-copy view of the recorded states as a (len(chain), *state_shape) array."""
+        return self._data[:self._length]
+
+    def reserve(self, capacity):
+        """Make sure there is room for at least capacity states without reallocating."""
+        if capacity > len(self._data):
+            self._resize(capacity)
+
+    def _resize(self, capacity):
+        data = np.empty((capacity,) + self.state_shape)
+        data[:self._length] = self._data[:self._length]
+        self._data = data
+
+    def append(self, state):
+        """Append a state to the end of the chain."""
+        if self._length == len(self._data):
+            self._resize(self.growth_factor * len(self._data))
+        self._data[self._length] = state
+        self._length += 1
+
+    def repeat_last(self):
+        """Append a copy of the current state, i.e. record a rejected proposal."""
+        self.append(self._data[self._length - 1])
+
+    def copy(self):
+        """Return a copy of the chain."""
+        chain = Chain(self._data[0], capacity=len(self._data))
+        chain._data[:self._length] = self._data[:self._length]
+        chain._length = self._length
+        return chain
+
+    def reset(self):
+        """Discard every state except the initial one."""
+        self._length = 1
+
+    def expected_squared_jump_distance(self):
+        """Return the mean squared distance between consecutive states.
+        For a chain of batched states this is one value per row."""
+        states = self.view()
+        return np.mean(np.sum((states[1:] - states[:-1]) ** 2, axis=-1), axis=0)
+
+    def mean(self):
+        """Return the per-coordinate mean of the recorded states."""
+        return np.mean(self.view(), axis=0)
+
+    def variance(self):
+        """Return the per-coordinate variance of the recorded states."""
+        return np.var(self.view(), axis=0)
+
+    def weighted_samples(self):
+        """Return the recorded states together with their multiplicities (None means all ones)."""
+        return self.view(), None
+
+
+class StreamingChain:
+    """Chain storage that never keeps the history of the chain.
+
+    Only the current state is kept, along with running accumulators: the number of states,
+    the sum of squared jumps between consecutive states, and the per-coordinate Welford mean
+    and sum of squared deviations. Memory is O(dim) regardless of the number of iterations,
+    while the ESJD, mean and variance remain available.
+    """
+
+    def __init__(self, initial_state):
+        """Initialize the chain with its initial state.
+
+        Args:
+            initial_state (np.ndarray): The first state of the chain. Its shape is the shape of every state.
+        """
+        self._initial_state = np.array(initial_state, dtype=float)
+        self.state_shape = self._initial_state.shape
+        self.reset()
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index in (-1, self._length - 1):
+            return self._current
+        if index in (0, -self._length):
+            return self._initial_state
+        raise IndexError("A streaming chain only keeps its initial and current states.")
+
+    def __setitem__(self, index, state):
+        if index not in (-1, self._length - 1):
+            raise IndexError("A streaming chain can only overwrite its current state.")
+        if self._length == 1:
+            self._initial_state = np.array(state, dtype=float)
+            self.reset()
+            return
+        ### undo the contribution of the current state, then add the new state in its place
+        state = np.asarray(state, dtype=float)
+        n = self._length
+        mean_before = (n * self._mean - self._current) / (n - 1)
+        self._m2 -= (self._current - mean_before) * (self._current - self._mean)
+        self._mean = mean_before
+        self._squared_jump_sum -= self._last_squared_jump
+        self._length -= 1
+        self._current = self._previous
+        self.append(state)
+
+    def __array__(self, dtype=None, copy=None):
+        raise ValueError("The chain history is not stored in streaming mode.")
+
+    def view(self):
+        """Streaming chains have no stored history to view."""
+        raise ValueError("The chain history is not stored in streaming mode.")
+
+    def reserve(self, capacity):
+        """Streaming chains need no preallocated storage."""
+        pass
+
+    def append(self, state):
+        """Add a state to the running statistics and make it the current state."""
+        state = np.array(state, dtype=float)
+        self._last_squared_jump = np.sum((state - self._current) ** 2, axis=-1)
+        self._squared_jump_sum += self._last_squared_jump
+        self._length += 1
+        # Welford update of the running mean and sum of squared deviations
+        delta = state - self._mean
+        self._mean += delta / self._length
+        self._m2 += delta * (state - self._mean)
+        self._previous = self._current
+        self._current = state
+
+    def repeat_last(self):
+        """Add the current state again, i.e. record a rejected proposal."""
+        self.append(self._current)
+
+    def copy(self):
+        """Return a copy of the chain."""
+        chain = StreamingChain(self._initial_state)
+        chain.__dict__.update({key: np.copy(value) if isinstance(value, np.ndarray) else value
+                               for key, value in self.__dict__.items()})
+        return chain
+
+    def reset(self):
+        """Discard every state except the initial one."""
+        self._current = self._initial_state.copy()
+        self._previous = self._current
+        self._length = 1
+        self._squared_jump_sum = np.zeros(self.state_shape[:-1])
+        self._last_squared_jump = np.zeros(self.state_shape[:-1])
+        self._mean = self._initial_state.copy()
+        self._m2 = np.zeros(self.state_shape)
+
+    def expected_squared_jump_distance(self):
+        """Return the mean squared distance between consecutive states.
+        For a chain of batched states this is one value per row."""
+        return self._squared_jump_sum / (self._length - 1)
+
+    def mean(self):
+        """Return the running per-coordinate mean of the states."""
+        return self._mean.copy()
+
+    def variance(self):
+        """Return the running per-coordinate (population) variance of the states."""
+        return self._m2 / self._length
+
+    def weighted_samples(self):
+        """Streaming chains have no stored samples."""
+        raise ValueError("The chain history is not stored in streaming mode.")
+
+
+class RunLengthChain:
+    """Run-length encoded chain storage for runs with a low acceptance rate.
+
+    A Metropolis chain repeats its current state on every rejected proposal. This storage keeps
+    only the distinct states of the chain, in a geometrically growing array, together with the
+    number of consecutive iterations each of them was held. At an acceptance rate a this takes
+    roughly a times the memory of a Chain. The ESJD, mean, variance and histograms are computed
+    directly on the compressed form, in time proportional to the number of distinct states.
+    Indexing expands only the requested positions.
+    """
+    growth_factor = 2
+
+    def __init__(self, initial_state, capacity=1):
+        """Initialize the chain with its initial state.
+
+        Args:
+            initial_state (np.ndarray): The first state of the chain. Its shape is the shape of every state.
+            capacity (int): Number of distinct states to preallocate room for.
+        """
+        initial_state = np.asarray(initial_state, dtype=float)
+        self.state_shape = initial_state.shape
+        self._states = np.empty((max(capacity, 1),) + self.state_shape)
+        self._counts = np.zeros(max(capacity, 1), dtype=np.int64)
+        self._states[0] = initial_state
+        self._counts[0] = 1
+        self._num_runs = 1
+        self._length = 1
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def num_runs(self):
+        """Number of distinct (consecutive) states stored."""
+        return self._num_runs
+
+    def _run_index(self, positions):
+        """Map positions in the expanded chain to the index of the run holding them."""
+        ends = np.cumsum(self._counts[:self._num_runs])
+        return np.searchsorted(ends, positions, side='right')
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index == -1:     # fast path for the current state
+            return self._states[self._num_runs - 1]
+        rest = ()
+        if isinstance(index, tuple):
+            index, rest = index[0], index[1:]
+        return self._states[:self._num_runs][(self._run_index(self._positions(index)),) + rest]
+
+    def _positions(self, index):
+        """Return the positions in the expanded chain selected by an int, slice, mask or integer array index,
+        without materializing the positions that were not asked for."""
+        if isinstance(index, slice):
+            return np.arange(*index.indices(self._length))
+        positions = np.asarray(index)
+        if positions.dtype == bool:
+            if positions.shape != (self._length,):
+                raise IndexError(f"Boolean index of shape {positions.shape} does not match a chain of length {self._length}.")
+            return np.flatnonzero(positions)
+        if not np.issubdtype(positions.dtype, np.integer):
+            raise IndexError("Only integers, slices and integer or boolean arrays are valid chain indices.")
+        if np.any((positions < -self._length) | (positions >= self._length)):
+            raise IndexError(f"Index out of range for a chain of length {self._length}.")
+        return np.where(positions < 0, positions + self._length, positions)
+
+    def __setitem__(self, index, state):
+        if index not in (-1, self._length - 1):
+            raise IndexError("A run-length encoded chain can only overwrite its current state.")
+        if self._counts[self._num_runs - 1] > 1:
+            # split the last run: the current iteration now holds a different state
+            self._counts[self._num_runs - 1] -= 1
+            self._length -= 1
+            self.append(state)
+        else:
+            self._states[self._num_runs - 1] = state
+
+    def __iter__(self):
+        return iter(np.asarray(self))
+
+    def __array__(self, dtype=None, copy=None):
+        states = np.repeat(self._states[:self._num_runs], self._counts[:self._num_runs], axis=0)
+        return states if dtype is None else states.astype(dtype, copy=False)
+
+    def view(self):
+        """Return the expanded (len(chain), *state_shape) array of states. Unlike Chain.view this is a copy."""
+        return np.asarray(self)
+
+    def reserve(self, capacity):
+        """The number of distinct states is not known in advance, so storage grows on demand."""
+        pass
+
+    def _resize(self, capacity):
+        states = np.empty((capacity,) + self.state_shape)
+        states[:self._num_runs] = self._states[:self._num_runs]
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:self._num_runs] = self._counts[:self._num_runs]
+        self._states, self._counts = states, counts
+
+    def append(self, state):
+        """Append a state as the start of a new run."""
+        if self._num_runs == len(self._states):
+            self._resize(self.growth_factor * len(self._states))
+        self._states[self._num_runs] = state
+        self._counts[self._num_runs] = 1
+        self._num_runs += 1
+        self._length += 1
+
+    def repeat_last(self):
+        """Hold the current state for one more iteration, i.e. record a rejected proposal."""
+        self._counts[self._num_runs - 1] += 1
+        self._length += 1
+
+    def copy(self):
+        """Return a copy of the chain."""
+        chain = RunLengthChain(self._states[0], capacity=len(self._states))
+        chain._states[:self._num_runs] = self._states[:self._num_runs]
+        chain._counts[:self._num_runs] = self._counts[:self._num_runs]
+        chain._num_runs, chain._length = self._num_runs, self._length
+        return chain
+
+    def reset(self):
+        """Discard every state except the initial one."""
+        self._counts[0] = 1
+        self._num_runs = 1
+        self._length = 1
+
+    def expected_squared_jump_distance(self):
+        """Return the mean squared distance between consecutive states.
+        Repeated states contribute zero jumps, so only the jumps between runs are summed."""
+        states = self._states[:self._num_runs]
+        return np.sum(np.sum((states[1:] - states[:-1]) ** 2, axis=-1), axis=0) / (self._length - 1)
+
+    def mean(self):
+        """Return the per-coordinate mean of the states, weighting each distinct state by its run length."""
+        return np.average(self._states[:self._num_runs], axis=0, weights=self._counts[:self._num_runs])
+
+    def variance(self):
+        """Return the per-coordinate variance of the states, weighting each distinct state by its run length."""
+        deviations = self._states[:self._num_runs] - self.mean()
+        return np.average(deviations ** 2, axis=0, weights=self._counts[:self._num_runs])
+
+    def weighted_samples(self):
+        """Return the distinct states together with their run lengths."""
+        return self._states[:self._num_runs], self._counts[:self._num_runs]
+
+
+class MemmapChain(Chain):
+    """Chain storage that writes the states into a memory-mapped file on disk.
+
+    The file starts with a small JSON header describing the dtype, the shape of a state,
+    the number of recorded states and the run metadata, followed by the states as a
+    raw (capacity, *state_shape) array. Memory use is bounded by what the operating
+    system keeps paged in, and a finished run can be reopened with MemmapChain.open
+    without reading it into memory.
+    The header is rewritten on flush(); call it (MCMCSimulation does) once the run is finished.
+    """
+    header_size = 1024
+    magic = b"MCMCCHAIN\n"
+
+    def __init__(self, initial_state, path, capacity=1):
+        """Create the chain file and write the initial state.
+
+        Args:
+            initial_state (np.ndarray): The first state of the chain. Its shape is the shape of every state.
+            path (str): Path of the chain file. Missing directories are created.
+            capacity (int): Number of states to preallocate room for in the file.
+        """
+        initial_state = np.asarray(initial_state, dtype=float)
+        self.path = path
+        self.state_shape = initial_state.shape
+        self.metadata = {}
+        self.read_only = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as file:
+            file.truncate(self.header_size)
+        self._length = 0
+        self._map(max(capacity, 1))
+        self._data[0] = initial_state
+        self._length = 1
+        self.flush()
+
+    def _map(self, capacity):
+        """(Re)map the data section of the file with room for capacity states, growing the file if needed."""
+        size = self.header_size + capacity * int(np.prod(self.state_shape, dtype=int)) * np.dtype(float).itemsize
+        if os.path.getsize(self.path) < size:
+            with open(self.path, "r+b") as file:
+                file.truncate(size)
+        self._data = np.memmap(self.path, dtype=float, mode="r" if self.read_only else "r+",
+                               offset=self.header_size, shape=(capacity,) + self.state_shape)
+
+    def _resize(self, capacity):
+        self._data.flush()
+        self._map(capacity)
+
+    def _write_header(self):
+        header = json.dumps({
+            "dtype": np.dtype(float).str,
+            "state_shape": list(self.state_shape),
+            "length": self._length,
+            "capacity": len(self._data),
+            "metadata": self.metadata,
+        }).encode()
+        if len(self.magic) + len(header) + 1 > self.header_size:
+            raise ValueError("The chain metadata does not fit in the file header.")
+        with open(self.path, "r+b") as file:
+            file.write(self.magic + header.ljust(self.header_size - len(self.magic) - 1) + b"\n")
+
+    def flush(self):
+        """Write the recorded states and the header to disk."""
+        if self.read_only:
+            return
+        self._data.flush()
+        self._write_header()
+
+    def __getstate__(self):
+        # pickle a reference to the file instead of the states, e.g. for checkpoints
+        self.flush()
+        state = self.__dict__.copy()
+        state["_capacity"] = len(state.pop("_data"))
+        return state
+
+    def __setstate__(self, state):
+        capacity = state.pop("_capacity")
+        self.__dict__.update(state)
+        self._map(capacity)
+
+    def copy(self):
+        """Return an in-memory copy of the chain."""
+        chain = Chain(self._data[0], capacity=self._length)
+        chain._data[:self._length] = self._data[:self._length]
+        chain._length = self._length
+        return chain
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        """Reopen a chain file written by a previous run without loading it into memory.
+
+        Args:
+            path (str): Path of the chain file.
+            mode (str): "r" to open the chain read-only, "r+" to continue appending to it.
+        """
+        with open(path, "rb") as file:
+            if file.read(len(cls.magic)) != cls.magic:
+                raise ValueError(f"'{path}' is not a chain file.")
+            header = json.loads(file.read(cls.header_size - len(cls.magic)))
+        chain = cls.__new__(cls)
+        chain.path = path
+        chain.state_shape = tuple(header["state_shape"])
+        chain.metadata = header["metadata"]
+        chain.read_only = (mode == "r")
+        chain._length = header["length"]
+        chain._map(header["capacity"])
+        return chain
+
+
+def make_chain(storage, initial_state, path=None):
+    """Create the chain storage of the given kind, starting from initial_state.
+
+    Args:
+        storage (str): "array" to keep every state in a preallocated array,
+            "run_length" to keep only the distinct states and their repeat counts,
+            "memmap" to write every state into a memory-mapped file at path,
+            or "streaming" to keep only running statistics.
+        initial_state (np.ndarray): The first state of the chain.
+        path (str): Path of the chain file, only used by the "memmap" storage.
+    """
+    if storage == "array":
+        return Chain(initial_state)
+    elif storage == "run_length":
+        return RunLengthChain(initial_state)
+    elif storage == "memmap":
+        if path is None:
+            raise ValueError("The memmap chain storage needs a path.")
+        return MemmapChain(initial_state, path)
+    elif storage == "streaming":
+        return StreamingChain(initial_state)
+    else:
+        raise ValueError(f"Unknown chain storage '{storage}'")
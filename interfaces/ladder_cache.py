@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+
+def _update_hash(h, value):
+    """Feed a (possibly nested) attribute value into the hash object h."""
+    if isinstance(value, np.ndarray):
+        h.update(f"ndarray{value.dtype.str}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_hash(h, item)
+    elif isinstance(value, dict):
+        h.update(f"dict{len(value)}".encode())
+        for key in sorted(value):
+            h.update(repr(key).encode())
+            _update_hash(h, value[key])
+    else:
+        h.update(repr(value).encode())
+
+
+def target_fingerprint(target_dist):
+    """Return a sha256 digest of the name and all parameters (attributes) of a target distribution."""
+    h = hashlib.sha256()
+    h.update(target_dist.get_name().encode())
+    _update_hash(h, vars(target_dist))
+    return h.hexdigest()
+
+
+class LadderCache:
+    """On-disk cache of constructed inverse temperature ladders.
+
+    Each ladder is stored in its own JSON file named after the sha256 digest of everything
+    that determines the construction: the target name and parameters, the dimension, the ideal
+    swap acceptance rate, the construction settings and the seed. Files are written to a
+    temporary file first and then atomically renamed, so concurrent writers never leave a
+    partially written ladder behind (the last writer wins, and all of them write a valid ladder).
+    An entry can also hold the per-temperature proposal variances adapted with the ladder,
+    together with the settings of the proposals they were adapted for.
+    """
+
+    # part of every key, increase it when the construction (e.g. draw_sample of the targets) changes
+    version = 2
+
+    def __init__(self, directory="data/ladder_cache"):
+        """
+        Args:
+            directory (str): Directory of the cache files, created on the first write.
+        """
+        self.directory = directory
+
+    def key(self, target_dist, dim, swap_acceptance_rate, settings, seed=None):
+        """Return the cache key and its human-readable description.
+
+        Args:
+            target_dist (TargetDistribution): The target distribution.
+            dim (int): Dimension of the target.
+            swap_acceptance_rate (float): The ideal swap acceptance rate of the construction.
+            settings (dict): The remaining construction settings, e.g. the number of samples and tolerance.
+            seed (int): The seed of the construction.
+        """
+        description = {
+            "target": target_dist.get_name(),
+            "target_parameters": target_fingerprint(target_dist),
+            "dim": dim,
+            "swap_acceptance_rate": float(swap_acceptance_rate),
+            "settings": settings,
+            "seed": seed,
+            "version": self.version,
+        }
+        key = hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+        return key, description
+
+    def path(self, key):
+        """Return the path of the cache file of key."""
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load_entry(self, key):
+        """Return the cache entry for key as a dict with at least a "beta_ladder",
+        or None if it is not cached."""
+        try:
+            with open(self.path(key), "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) and "beta_ladder" in entry else None
+
+    def load(self, key):
+        """Return the cached ladder for key as a list of floats, or None if it is not cached."""
+        entry = self.load_entry(key)
+        return entry["beta_ladder"] if entry is not None else None
+
+    def save(self, key, beta_ladder, description=None, proposal_vars=None, target_acceptance_rate=None,
+             proposal_settings=None):
+        """Store the ladder for key, optionally with the proposal variances adapted
+        toward target_acceptance_rate at each temperature by the proposals described by proposal_settings."""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"beta_ladder": [float(beta) for beta in beta_ladder], "key": description}
+        if proposal_vars is not None:
+            entry["proposal_vars"] = [float(var) for var in proposal_vars]
+            entry["target_acceptance_rate"] = float(target_acceptance_rate)
+            entry["proposal_settings"] = proposal_settings
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(entry, file)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
@@ -2,6 +2,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from typing import Optional, Callable
 from .target import TargetDistribution
+from .chain import Chain, make_chain
 
 class MHAlgorithm:
     """General purpose Metropolis-Hastings algorithm interface for sampling from a target distribution.
@@ -9,26 +10,51 @@ class MHAlgorithm:
     This class is designed to be subclassed to implement specific calculations for the acceptance probability.
     The step method must be implemented in the subclass.
     
-    The chain attribute stores the Markov chain of samples generated by the algorithm.
-    The current state of the algorithm is the last element of the chain.
+    The chain attribute stores the Markov chain of samples generated by the algorithm
+    in a preallocated array (see Chain). The current state of the algorithm is the last element of the chain.
     """
     def __init__(self, dim, var, target_dist: TargetDistribution = None, symmetric=True):
         self.dim = dim
         self.var = var
         self.target_dist = target_dist
-        self.chain = [np.random.random(self.dim)]
+        self.chain = Chain(np.random.random(self.dim))
         self.symmetric = symmetric
         self.num_acceptances = 0    # use this to calculate acceptance rate
         self.acceptance_rate = 0
         self.target_density = target_dist.density
+        self.log_target_density = target_dist.log_density
 
     def reset(self):
         """Reset the Markov chain to the initial state."""
-        self.chain = [self.chain[0]]
+        self.chain.reset()
+
+    def set_chain_storage(self, storage, path=None):
+        """Choose how the chain is stored before the algorithm is run.
+
+        Args:
+            storage (str): "array" to keep every state, "run_length" to keep only the distinct
+                states and how long each was held (compact when the acceptance rate is low),
+                "memmap" to write every state into a memory-mapped file on disk,
+                or "streaming" to keep only the current state and running statistics
+                (ESJD, per-coordinate mean and variance).
+            path (str): Path of the chain file for the "memmap" storage.
+        """
+        if len(self.chain) > 1:
+            raise ValueError("Please set the chain storage before running the algorithm.")
+        self.chain = make_chain(storage, self.chain[0], path=path)
+
+    def reserve(self, num_iterations):
+        """Preallocate chain storage for num_iterations more steps."""
+        self.chain.reserve(len(self.chain) + num_iterations)
 
     def step(self):
         """Take a step using the Metropolis-Hastings algorithm. Must be implemented in subclass."""
         raise NotImplementedError("Step method must be implemented in subclass")
+
+    def run(self, num_iterations):
+        """Take num_iterations steps. Subclasses may override this to take many steps at once."""
+        for _ in range(num_iterations):
+            self.step()
     
     def get_curr_state(self):
         """Return the current state of the algorithm."""
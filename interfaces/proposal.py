@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class ProposalDistribution:
+    """General interface for random walk proposal distributions.
+
+    A proposal kernel moves the current state by a random step with covariance (var / beta) * C,
+    where C is a fixed base covariance defined by the subclass. The step is obtained by
+    transforming standard noise with a factor of the proposal covariance. The factor only
+    depends on (var, beta), so it is computed once and cached until var or beta changes.
+
+    var and beta may be scalars or arrays with one value per row of the current state,
+    in which case every row is proposed with its own covariance.
+
+    Subclasses also provide the proposal log density in closed form, so that the Hastings
+    correction of a non-symmetric kernel never goes through scipy. Symmetric kernels set
+    the symmetric attribute and report a log proposal ratio of exactly zero.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.symmetric = True
+        self._factor_key = None
+        self._factor = None
+
+    def get_name(self):
+        """Return the name of the proposal distribution as a string."""
+        raise NotImplementedError("Subclasses must implement the get_name method.")
+
+    def factor(self, var, beta=1.0):
+        """Return the factor of the proposal covariance (var / beta) * C.
+        The factor is recomputed only when var or beta differ from the previous call."""
+        var = np.asarray(var, dtype=float)
+        beta = np.asarray(beta, dtype=float)
+        key = (var.shape, var.tobytes(), beta.shape, beta.tobytes())
+        if key != self._factor_key:
+            self._factor = self.compute_factor(var, beta)
+            self._factor_key = key
+        return self._factor
+
+    def compute_factor(self, var, beta):
+        """Compute the factor of the proposal covariance (var / beta) * C. Must be implemented in subclass."""
+        raise NotImplementedError("Subclasses must implement the compute_factor method.")
+
+    def sample_noise(self, size=()):
+        """Draw standard noise of shape (*size, dim) that propose transforms into proposal steps."""
+        size = (size,) if np.isscalar(size) else tuple(size)
+        return np.random.standard_normal(size + (self.dim,))
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Transform standard noise into proposed states around mean. Must be implemented in subclass."""
+        raise NotImplementedError("Subclasses must implement the propose method.")
+
+    def draw(self, mean, var, beta=1.0):
+        """Draw proposed states around mean, which is either one state of shape (dim,)
+        or a batch of states of shape (n, dim)."""
+        return self.propose(mean, self.sample_noise(np.shape(mean)[:-1]), var, beta)
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Compute the log density log q(proposed_state | current_state) of proposing proposed_state
+        from current_state. Works row-wise on (n, dim) arrays. Must be implemented in subclass."""
+        raise NotImplementedError("Subclasses must implement the log_density method.")
+
+    def log_proposal_ratio(self, current_state, proposed_state, var, beta=1.0):
+        """Compute the Hastings correction log q(current_state | proposed_state) - log q(proposed_state | current_state).
+        The ratio is exactly zero for symmetric kernels, so no density is evaluated in that case."""
+        if self.symmetric:
+            return 0.0
+        return (self.log_density(current_state, proposed_state, var, beta)
+                - self.log_density(proposed_state, current_state, var, beta))
@@ -0,0 +1,50 @@
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 10000          # steps drawn at a time
+DEFAULT_BUFFER_ELEMENTS = 1000000   # bound on the random numbers held per buffer, 8 MB of float64
+
+
+def default_block_size(dim, num_chains=1):
+    """Return the number of steps to draw at a time for num_chains chains of dimension dim:
+    DEFAULT_BLOCK_SIZE chain-steps spread over the chains, reduced so that a block of proposal
+    noise holds at most DEFAULT_BUFFER_ELEMENTS numbers in high dimensions."""
+    return max(1, min(DEFAULT_BLOCK_SIZE // num_chains, DEFAULT_BUFFER_ELEMENTS // (num_chains * dim)))
+
+
+def log_uniform(size):
+    """Draw log-uniform random numbers log(U), U ~ Uniform[0, 1), used in accept tests."""
+    return np.log(np.random.random(size))
+
+
+class RandomBuffer:
+    """Buffer of random numbers that are generated in blocks and consumed one step at a time.
+
+    Drawing block_size steps' worth of random numbers in one call avoids the overhead
+    of calling the random number generator on every iteration of the hot loop.
+    Since the blocks are drawn from the global numpy generator in the order the buffers are
+    refilled, a run is bit-for-bit reproducible for a given seed and block size.
+    """
+
+    def __init__(self, sampler, shape=(), block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Args:
+            sampler (callable): Function that takes a size tuple and returns random numbers of
+                that shape, e.g. ProposalDistribution.sample_noise or log_uniform. It must be
+                picklable (a module-level function or a bound method) so that algorithms can be checkpointed.
+            shape (tuple): Shape of the random numbers consumed per step.
+            block_size (int): Number of steps drawn per call to the sampler.
+        """
+        self.sampler = sampler
+        self.shape = tuple(shape)
+        self.block_size = block_size
+        self._block = None
+        self._position = block_size
+
+    def next(self):
+        """Return the random numbers for the next step, refilling the buffer if it is exhausted."""
+        if self._position >= self.block_size:
+            self._block = self.sampler((self.block_size,) + self.shape)
+            self._position = 0
+        value = self._block[self._position]
+        self._position += 1
+        return value
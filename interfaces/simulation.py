@@ -1,7 +1,10 @@
+import os
+import pickle
 import numpy as np
 import matplotlib.pyplot as plt
 from .metropolis import MHAlgorithm
 from .target import TargetDistribution
+from .chain import MemmapChain
 from typing import Optional, Callable
 import tqdm
 
@@ -17,7 +20,9 @@ class MCMCSimulation:
                  symmetric: bool = True,
                  seed: Optional[int] = None,
                  beta_ladder: Optional[list] = None,
-                 swap_acceptance_rate: Optional[float] = None,):
+                 swap_acceptance_rate: Optional[float] = None,
+                 storage: str = "array",
+                 chain_path: Optional[str] = None,):
         self.num_iterations = num_iterations
         self.target_dist = target_dist
         self.algorithm = algorithm(dim, 
@@ -26,6 +31,18 @@ class MCMCSimulation:
                                    symmetric, 
                                    beta_ladder=beta_ladder, 
                                    swap_acceptance_rate=swap_acceptance_rate)   # comment out last two lines for standard rwm
+        # "streaming" keeps only running statistics of the chain, for sweeps over many long runs,
+        # "run_length" keeps only the distinct states, for runs with a low acceptance rate,
+        # "memmap" writes the chain to disk so that long runs can be reopened later with MCMCSimulation.load,
+        # by default to a file named after the settings of the run, so that runs of a sweep do not overwrite each other
+        if storage == "memmap" and chain_path is None:
+            settings = f"var{sigma:g}"
+            if swap_acceptance_rate is not None:
+                settings += f"_swap{swap_acceptance_rate:g}"
+            chain_path = (f"data/{target_dist.get_name()}_{self.algorithm.get_name()}_dim{dim}_{settings}"
+                          f"_seed{seed}_{num_iterations}iters.chain")
+        self.chain_path = chain_path
+        self.algorithm.set_chain_storage(storage, path=chain_path)
         if seed:
             np.random.seed(seed)
 
@@ -38,17 +55,135 @@ class MCMCSimulation:
         """Return whether the algorithm has been run."""
         return len(self.algorithm.chain) > 1
 
-    def generate_samples(self):
+    def generate_samples(self, checkpoint_path: Optional[str] = None, checkpoint_every: Optional[int] = None):
+        """Run the algorithm for num_iterations steps.
+
+        Args:
+            checkpoint_path (str): If given, the whole simulation (algorithm state, chain, beta ladder,
+                counters and the state of the global random number generator) is saved to this file
+                every checkpoint_every iterations and at the end of the run, see MCMCSimulation.resume.
+            checkpoint_every (int): Number of iterations between checkpoints. Defaults to a tenth of the run.
+        Returns:
+            The chain of the algorithm.
+        """
         if self.has_run():
             raise ValueError("Please reset the algorithm before running it again.")
         
+        self.algorithm.reserve(self.num_iterations)
+        return self._run(0, checkpoint_path, checkpoint_every)
+
+    def _run(self, start, checkpoint_path, checkpoint_every):
+        """Take the steps start, ..., num_iterations - 1, checkpointing along the way."""
+        if checkpoint_path is not None and checkpoint_every is None:
+            checkpoint_every = max(1, self.num_iterations // 10)
+        # the algorithm is run in chunks, which lets multi-process algorithms step many iterations per call
+        chunk_size = max(1, self.num_iterations // 1000)
         print("Running the MCMC simulation...")
-        with tqdm.tqdm(total=self.num_iterations, desc="Running MCMC", unit="iteration") as pbar:
-            for i in range(self.num_iterations):
-                self.algorithm.step()
-                pbar.update(1)
+        with tqdm.tqdm(total=self.num_iterations, initial=start, desc="Running MCMC", unit="iteration") as pbar:
+            i = start
+            while i < self.num_iterations:
+                num_steps = min(chunk_size, self.num_iterations - i)
+                if checkpoint_path is not None:
+                    num_steps = min(num_steps, checkpoint_every - i % checkpoint_every)
+                self.algorithm.run(num_steps)
+                i += num_steps
+                pbar.update(num_steps)
+                if checkpoint_path is not None and i % checkpoint_every == 0:
+                    self.save_checkpoint(checkpoint_path, i, checkpoint_every)
+        if hasattr(self.algorithm, 'close'):  # stop the worker processes of multi-process algorithms
+            self.algorithm.close()
 
+        if isinstance(self.algorithm.chain, MemmapChain):
+            self.save_metadata()
+        if checkpoint_path is not None:
+            self.save_checkpoint(checkpoint_path, self.num_iterations, checkpoint_every)
         return self.algorithm.chain
+
+    def save_checkpoint(self, path, iteration, checkpoint_every=None):
+        """Save the simulation after iteration steps so that it can be continued with MCMCSimulation.resume.
+
+        The checkpoint is written to a temporary file that then replaces path, so a run
+        killed while checkpointing leaves the previous checkpoint intact.
+        Chains with the "memmap" storage are flushed and stored by reference to their file, the other
+        chains only store their recorded states and reserve their capacity again when loaded.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        checkpoint = {
+            "simulation": self,
+            "iteration": iteration,
+            "checkpoint_every": checkpoint_every,
+            "random_state": np.random.get_state(),
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def resume(cls, path, checkpoint_every: Optional[int] = None):
+        """Continue a run from a checkpoint written by generate_samples.
+
+        The algorithm state and the global random number generator are restored, so the
+        resumed run produces exactly the same chain as an uninterrupted one. The run keeps
+        checkpointing to the same file. Resuming a finished run just returns it.
+
+        Args:
+            path (str): Path of the checkpoint file.
+            checkpoint_every (int): Number of iterations between checkpoints, defaults to the saved value.
+        Returns:
+            MCMCSimulation: The finished simulation.
+        """
+        with open(path, "rb") as file:
+            checkpoint = pickle.load(file)
+        simulation = checkpoint["simulation"]
+        np.random.set_state(checkpoint["random_state"])
+        if checkpoint_every is None:
+            checkpoint_every = checkpoint["checkpoint_every"]
+        if checkpoint["iteration"] < simulation.num_iterations:
+            simulation._run(checkpoint["iteration"], path, checkpoint_every)
+        return simulation
+
+    def save_metadata(self):
+        """Write the run settings and results into the header of the on-disk chain files."""
+        metadata = {
+            "dim": self.algorithm.dim,
+            "var": np.asarray(self.algorithm.var).tolist(),
+            "num_iterations": self.num_iterations,
+            "algorithm": self.algorithm.get_name(),
+            "target": self.target_dist.get_name(),
+            "acceptance_rate": np.asarray(self.algorithm.acceptance_rate).tolist(),
+        }
+        if hasattr(self.algorithm, 'pt_esjd'): # parallel tempering case
+            metadata["pt_esjd"] = float(self.algorithm.pt_esjd)
+        chains = self.algorithm.chains if hasattr(self.algorithm, 'chains') else [self.algorithm.chain]
+        for chain in chains:
+            if isinstance(chain, MemmapChain):
+                chain.metadata = metadata
+                chain.flush()
+
+    @classmethod
+    def load(cls, path):
+        """Reopen a finished run from a chain file written with storage="memmap".
+
+        The chain is memory-mapped read-only, so the plots and metrics only page in the
+        states they read. The algorithm and target are replaced by lightweight stand-ins
+        that hold the settings and results stored in the file header.
+
+        Args:
+            path (str): Path of the chain file.
+        Returns:
+            MCMCSimulation: The reopened simulation. It cannot be run further.
+        """
+        chain = MemmapChain.open(path)
+        metadata = chain.metadata
+        simulation = cls.__new__(cls)
+        simulation.num_iterations = metadata["num_iterations"]
+        simulation.target_dist = _StoredTarget(metadata["target"])
+        simulation.algorithm = _StoredAlgorithm(chain, metadata)
+        simulation.chain_path = path
+        return simulation
     
     def acceptance_rate(self):
         """Return the acceptance rate of the algorithm."""
@@ -64,9 +199,19 @@ class MCMCSimulation:
         """
         if not self.has_run():
             raise ValueError("The algorithm has not been run yet.")
-        chain = np.array(self.algorithm.chain)
-        squared_jumps = np.sum((chain[1:] - chain[:-1]) ** 2, axis=1)
-        return np.mean(squared_jumps)
+        return self.algorithm.chain.expected_squared_jump_distance()
+
+    def sample_mean(self):
+        """Return the per-coordinate mean of the samples in the Markov chain."""
+        if not self.has_run():
+            raise ValueError("The algorithm has not been run yet.")
+        return self.algorithm.chain.mean()
+
+    def sample_variance(self):
+        """Return the per-coordinate variance of the samples in the Markov chain."""
+        if not self.has_run():
+            raise ValueError("The algorithm has not been run yet.")
+        return self.algorithm.chain.variance()
     
     def pt_expected_squared_jump_distance(self):
         """Calculate the expected squared jump distance for parallel tempering.
@@ -85,7 +230,7 @@ class MCMCSimulation:
         if not self.has_run():
             raise ValueError("The algorithm has not been run yet.")
         
-        chain = np.array(self.algorithm.chain)
+        chain = np.asarray(self.algorithm.chain)
         if single_dim:
             plt.plot(chain[:, 0], label=f"Dimension 1", alpha=0.7, lw=0.5)
         else:
@@ -116,10 +261,11 @@ class MCMCSimulation:
             num_bins (int): The number of bins in the histogram. Default is 50.
             axis (int): The dimension of the samples to plot. Default is 0 (first component)
         """
-        # Generate histogram of samples
-        samples = np.array(self.algorithm.chain)[:, axis]
+        # Generate histogram of samples, weighting each stored state by its multiplicity
+        samples, weights = self.algorithm.chain.weighted_samples()
+        samples = samples[:, axis]
 
-        plt.hist(samples, bins=num_bins, density=True, alpha=0.5, label='Samples')
+        plt.hist(samples, bins=num_bins, weights=weights, density=True, alpha=0.5, label='Samples')
 
         # Generate values for plotting the target density
         x = np.array([np.array([v]) for v in np.linspace(min(-20, min(samples) - 5), max(20, max(samples) + 5), 1000)])
@@ -141,4 +287,31 @@ class MCMCSimulation:
             plt.show()
         filename = f"images/hist_{self.target_dist.get_name()}_{self.algorithm.get_name()}_dim{self.algorithm.dim}_{self.num_iterations}iters"
         plt.savefig(filename)
-        plt.clf()
\ No newline at end of file
+        plt.clf()
+
+
+class _StoredTarget:
+    """Stand-in for the target distribution of a run reopened from disk."""
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+
+class _StoredAlgorithm:
+    """Stand-in for the algorithm of a run reopened from disk, exposing the chain and stored results."""
+    def __init__(self, chain, metadata):
+        self.chain = chain
+        self.dim = metadata["dim"]
+        self.var = metadata["var"]
+        self.acceptance_rate = metadata["acceptance_rate"]
+        self.name = metadata["algorithm"]
+        if "pt_esjd" in metadata:
+            self.pt_esjd = metadata["pt_esjd"]
+
+    def get_name(self):
+        return self.name
+
+    def reset(self):
+        raise ValueError("A run reopened from disk cannot be reset.")
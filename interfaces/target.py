@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class TargetDistribution:
     """General interface for target distributions."""
 
@@ -5,11 +8,47 @@ class TargetDistribution:
         self.dim = dimension
 
     def density(self, x):
-        """Compute the density of the distribution at a given point x."""
-        raise NotImplementedError("Subclasses must implement the density method.")
-
-    def draw_sample(self, beta=1.0):
-        """Draw a sample from the target distribution. This is meant to be a cheap heuristic
-        used for constructing the temperature ladder in parallel tempering.
-        Do not use this to draw samples in an actual Metropolis algorithm."""
-        raise NotImplementedError("Subclasses must implement the draw_sample method.")
\ No newline at end of file
+        """Compute the density of the distribution at a given point x.
+        This is derived from the log density; it underflows to 0 in high dimensions,
+        so algorithms should use log_density directly."""
+        return np.exp(self.log_density(x))
+
+    def log_density(self, x):
+        """Compute the log density of the distribution at a given point x.
+        Points outside the support have log density -inf."""
+        raise NotImplementedError("Subclasses must implement the log_density method.")
+
+    def density_batch(self, x):
+        """Compute the density of the distribution at each row of an (n, dim) array x."""
+        return np.exp(self.log_density_batch(x))
+
+    def log_density_batch(self, x):
+        """Compute the log density of the distribution at each row of an (n, dim) array x.
+        Subclasses can override this with a vectorized implementation; the default
+        evaluates the log density one row at a time."""
+        return np.array([self.log_density(x_i) for x_i in x], dtype=float)
+
+    def grad_log_density(self, x):
+        """Compute the gradient of the log density at a given point x, an array of shape (dim,).
+        Gradient-based algorithms such as MALA need this; at inverse temperature beta the gradient is scaled by beta.
+        Points outside the support have log density -inf, so their gradient is never used."""
+        raise NotImplementedError("Subclasses must implement the grad_log_density method.")
+
+    def grad_log_density_batch(self, x):
+        """Compute the gradient of the log density at each row of an (n, dim) array x.
+        Subclasses can override this with a vectorized implementation; the default
+        evaluates the gradient one row at a time."""
+        return np.array([self.grad_log_density(x_i) for x_i in x], dtype=float).reshape(-1, self.dim)
+
+    def draw_sample(self, beta=1.0, size=None):
+        """Draw samples from the tempered target distribution, whose density is proportional to p(x)^beta.
+        The built-in targets draw exact samples (all at once) where the tempered distribution allows it;
+        otherwise this may be a cheap heuristic, good enough for constructing the temperature ladder
+        in parallel tempering.
+
+        Args:
+            beta (float): The inverse temperature.
+            size (int): Number of samples to draw. If None, a single sample of shape (dim,)
+                is returned, otherwise an array of shape (size, dim).
+        """
+        raise NotImplementedError("Subclasses must implement the draw_sample method.")
@@ -0,0 +1,3 @@
+from .gaussian import *
+from .laplace import *
+from .uniform import *
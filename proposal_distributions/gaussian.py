@@ -0,0 +1,107 @@
+import numpy as np
+from interfaces import ProposalDistribution
+
+
+class IsotropicGaussianProposal(ProposalDistribution):
+    """Gaussian random walk proposal with covariance (var / beta) * I."""
+
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.name = "IsotropicGaussian"
+
+    def get_name(self):
+        """
+        Return the name of the proposal distribution as a string.
+        """
+        return self.name
+
+    def compute_factor(self, var, beta):
+        """The factor of (var / beta) * I is the standard deviation sqrt(var / beta),
+        with a trailing axis so that it broadcasts against (n, dim) noise."""
+        return np.sqrt(var / beta)[..., None]
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Return mean + sqrt(var / beta) * noise."""
+        return mean + self.factor(var, beta) * noise
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Closed-form Gaussian log density with standard deviation sqrt(var / beta) in every coordinate."""
+        std = self.factor(var, beta)[..., 0]
+        squared_distance = np.sum((proposed_state - current_state) ** 2, axis=-1)
+        return -0.5 * squared_distance / std ** 2 - self.dim * np.log(std) - 0.5 * self.dim * np.log(2 * np.pi)
+
+
+class DiagonalGaussianProposal(ProposalDistribution):
+    """Gaussian random walk proposal with covariance (var / beta) * diag(diagonal).
+    Useful when the coordinates of the target have different scales."""
+
+    def __init__(self, dim, diagonal):
+        """
+        Args:
+            dim (int): Dimension of the proposal.
+            diagonal (np.ndarray): The diagonal of the base covariance matrix.
+        """
+        super().__init__(dim)
+        self.name = "DiagonalGaussian"
+        self.diagonal = np.asarray(diagonal, dtype=float)
+        self.sqrt_diagonal = np.sqrt(self.diagonal)
+
+    def get_name(self):
+        """
+        Return the name of the proposal distribution as a string.
+        """
+        return self.name
+
+    def compute_factor(self, var, beta):
+        """The factor of (var / beta) * diag(diagonal) is the vector of per-coordinate standard deviations."""
+        return np.sqrt(var / beta)[..., None] * self.sqrt_diagonal
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Return mean + sqrt(var / beta) * sqrt(diagonal) * noise."""
+        return mean + self.factor(var, beta) * noise
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Closed-form Gaussian log density with per-coordinate standard deviations sqrt(var / beta * diagonal)."""
+        std = self.factor(var, beta)
+        standardized = (proposed_state - current_state) / std
+        return (-0.5 * np.sum(standardized ** 2, axis=-1) - np.sum(np.log(std), axis=-1)
+                - 0.5 * self.dim * np.log(2 * np.pi))
+
+
+class GaussianProposal(ProposalDistribution):
+    """Gaussian random walk proposal with full covariance (var / beta) * cov.
+    The Cholesky factor of cov is computed once at initialization."""
+
+    def __init__(self, dim, cov):
+        """
+        Args:
+            dim (int): Dimension of the proposal.
+            cov (np.ndarray): The (dim, dim) base covariance matrix.
+        """
+        super().__init__(dim)
+        self.name = "Gaussian"
+        self.cov = np.asarray(cov, dtype=float)
+        self.cholesky_factor = np.linalg.cholesky(self.cov)
+
+    def get_name(self):
+        """
+        Return the name of the proposal distribution as a string.
+        """
+        return self.name
+
+    def compute_factor(self, var, beta):
+        """The factor of (var / beta) * cov is sqrt(var / beta) * L where cov = L L^T."""
+        return np.sqrt(var / beta)[..., None, None] * self.cholesky_factor
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Return mean + sqrt(var / beta) * L @ noise."""
+        return mean + np.einsum('...ij,...j->...i', self.factor(var, beta), noise)
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Closed-form Gaussian log density using the cached Cholesky factor of the proposal covariance."""
+        factor = self.factor(var, beta)
+        difference = np.broadcast_to(proposed_state - current_state, np.broadcast_shapes(
+            np.shape(proposed_state), np.shape(current_state), factor.shape[:-1]))
+        standardized = np.linalg.solve(factor, difference[..., None])[..., 0]
+        log_det = np.sum(np.log(np.diagonal(factor, axis1=-2, axis2=-1)), axis=-1)
+        return -0.5 * np.sum(standardized ** 2, axis=-1) - log_det - 0.5 * self.dim * np.log(2 * np.pi)
@@ -0,0 +1,37 @@
+import numpy as np
+from interfaces import ProposalDistribution
+
+
+class LaplaceProposal(ProposalDistribution):
+    """Random walk proposal with iid Laplace (double exponential) steps in every coordinate.
+    The Laplace scale is chosen so that each coordinate of the step has variance var / beta,
+    which makes var directly comparable to the Gaussian kernels."""
+
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.name = "Laplace"
+
+    def get_name(self):
+        """
+        Return the name of the proposal distribution as a string.
+        """
+        return self.name
+
+    def compute_factor(self, var, beta):
+        """The standard deviation sqrt(var / beta) of each coordinate of the step."""
+        return np.sqrt(var / beta)[..., None]
+
+    def sample_noise(self, size=()):
+        """Draw unit-variance Laplace noise, i.e. with scale 1 / sqrt(2)."""
+        size = (size,) if np.isscalar(size) else tuple(size)
+        return np.random.laplace(0, 1 / np.sqrt(2), size + (self.dim,))
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Return mean + sqrt(var / beta) * noise."""
+        return mean + self.factor(var, beta) * noise
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Closed-form Laplace log density with scale b = sqrt(var / (2 beta)) in every coordinate."""
+        scale = self.factor(var, beta)[..., 0] / np.sqrt(2)
+        absolute_distance = np.sum(np.abs(proposed_state - current_state), axis=-1)
+        return -absolute_distance / scale - self.dim * np.log(2 * scale)
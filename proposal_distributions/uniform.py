@@ -0,0 +1,37 @@
+import numpy as np
+from interfaces import ProposalDistribution
+
+
+class UniformProposal(ProposalDistribution):
+    """Random walk proposal with iid uniform steps on [-h, h] in every coordinate.
+    The half-width h = sqrt(3 var / beta) is chosen so that each coordinate of the step has
+    variance var / beta, which makes var directly comparable to the Gaussian kernels."""
+
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.name = "Uniform"
+
+    def get_name(self):
+        """
+        Return the name of the proposal distribution as a string.
+        """
+        return self.name
+
+    def compute_factor(self, var, beta):
+        """The standard deviation sqrt(var / beta) of each coordinate of the step."""
+        return np.sqrt(var / beta)[..., None]
+
+    def sample_noise(self, size=()):
+        """Draw unit-variance uniform noise on [-sqrt(3), sqrt(3)]."""
+        size = (size,) if np.isscalar(size) else tuple(size)
+        return np.random.uniform(-np.sqrt(3), np.sqrt(3), size + (self.dim,))
+
+    def propose(self, mean, noise, var, beta=1.0):
+        """Return mean + sqrt(var / beta) * noise."""
+        return mean + self.factor(var, beta) * noise
+
+    def log_density(self, proposed_state, current_state, var, beta=1.0):
+        """Closed-form log density: -dim * log(2h) inside the box of half-width h around current_state, -inf outside."""
+        half_width = np.sqrt(3) * self.factor(var, beta)
+        inside = np.all(np.abs(proposed_state - current_state) <= half_width, axis=-1)
+        return np.where(inside, -self.dim * np.log(2 * half_width[..., 0]), -np.inf)
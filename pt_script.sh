@@ -1,7 +1,10 @@
 #!/bin/bash
 
-python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target MultivariateNormal --num_iters 100000 --init_seed 0 --num_seeds 5
-python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target RoughCarpet --num_iters 100000 --init_seed 0 --num_seeds 5
-python3 experiment_pt.py --dim 30 --swap_accept_max 0.6 --target RoughCarpet --num_iters 100000 --init_seed 0 --num_seeds 5
-python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target ThreeMixture --num_iters 100000 --init_seed 0 --num_seeds 5
-python3 experiment_pt.py --dim 30 --swap_accept_max 0.6 --target ThreeMixtureScaled --num_iters 100000 --init_seed 0 --num_seeds 5
\ No newline at end of file
+# worker processes per simulation, e.g. NUM_WORKERS=4 ./pt_script.sh on a machine with 4 free cores
+NUM_WORKERS=${NUM_WORKERS:-1}
+
+python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target MultivariateNormal --num_iters 100000 --init_seed 0 --num_seeds 5 --num_workers $NUM_WORKERS
+python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target RoughCarpet --num_iters 100000 --init_seed 0 --num_seeds 5 --num_workers $NUM_WORKERS
+python3 experiment_pt.py --dim 30 --swap_accept_max 0.6 --target RoughCarpet --num_iters 100000 --init_seed 0 --num_seeds 5 --num_workers $NUM_WORKERS
+python3 experiment_pt.py --dim 20 --swap_accept_max 0.6 --target ThreeMixture --num_iters 100000 --init_seed 0 --num_seeds 5 --num_workers $NUM_WORKERS
+python3 experiment_pt.py --dim 30 --swap_accept_max 0.6 --target ThreeMixtureScaled --num_iters 100000 --init_seed 0 --num_seeds 5 --num_workers $NUM_WORKERS
\ No newline at end of file
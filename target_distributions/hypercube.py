@@ -40,23 +40,59 @@ class Hypercube(TargetDistribution):
             return 0
         return 1
     
-    def density(self, x):
+    def log_density(self, x):
         """
-        Evaluates the probability density function (PDF) at a point x.
+        Evaluates the log of the probability density function (PDF) at a point x.
 
         Args:
             x (np.ndarray):
 
         Returns:
-            float: The value of the PDF at the point x.
+            float: 0 inside the hypercube and -inf outside of it.
+        """
+        x = np.asarray(x)
+        if np.all((x >= self.left_boundary) & (x <= self.right_boundary)):
+            return 0.0
+        return -np.inf
+
+    def log_density_batch(self, x):
+        """
+        Evaluates the log PDF at each row of an (n, dim) array x.
+
+        Args:
+            x (np.ndarray): Points of shape (n, dim).
+
+        Returns:
+            np.ndarray: 0 for the rows inside the hypercube and -inf for the others.
         """
-        return np.prod([self.density_1d(x[i]) for i in range(self.dim)])
+        x = np.asarray(x).reshape(-1, self.dim)
+        inside = np.all((x >= self.left_boundary) & (x <= self.right_boundary), axis=1)
+        return np.where(inside, 0.0, -np.inf)
 
-    def draw_sample(self):
+    def grad_log_density(self, x):
+        """
+        Evaluates the gradient of the log PDF at a point x, which is 0 inside the hypercube
+        (and 0 by convention outside of it, where the log PDF is -inf).
+        """
+        return np.zeros(self.dim)
+
+    def grad_log_density_batch(self, x):
+        """
+        Evaluates the gradient of the log PDF at each row of an (n, dim) array x, see grad_log_density.
+        """
+        return np.zeros((len(x), self.dim))
+
+    def draw_sample(self, beta=1.0, size=None):
         """
         Draws a sample from the hypercube target density.
+        The density is flat, so tempering it by any inverse temperature beta leaves it unchanged.
+
+        Args:
+            beta (float): The inverse temperature.
+            size (int): Number of samples to draw, a single sample if None.
 
         Returns:
-            np.ndarray: A sample from the hypercube target density.
+            np.ndarray: A sample (or size samples) from the hypercube target density.
         """
-        return np.random.uniform(self.left_boundary, self.right_boundary, self.dim)
\ No newline at end of file
+        shape = self.dim if size is None else (size, self.dim)
+        return np.random.uniform(self.left_boundary, self.right_boundary, shape)
\ No newline at end of file
@@ -24,24 +24,55 @@ class IIDGamma(TargetDistribution):
         """
         return self.name
     
-    def density(self, x):
+    def log_density(self, x):
         """
-        Evaluate the density at a point x in d-dimensional space.
+        Evaluate the log density at a point x in d-dimensional space.
+        The per-coordinate log densities are summed, so this does not underflow in high dimensions.
         
         Parameters:
         x (array-like): A point in d-dimensional space.
         
         Returns:
-        float: The density evaluated at x.
+        float: The log density evaluated at x.
         """
-        return np.prod(gamma.pdf(x, a=self.shape, scale=self.scale))
+        return np.sum(gamma.logpdf(x, a=self.shape, scale=self.scale))
+
+    def log_density_batch(self, x):
+        """
+        Evaluate the log density at each row of an (n, d) array x in one vectorized call.
+
+        Parameters:
+        x (array-like): Points of shape (n, d).
+
+        Returns:
+        numpy.ndarray: The n log densities.
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        return np.sum(gamma.logpdf(x, a=self.shape, scale=self.scale), axis=1)
+
+    def grad_log_density(self, x):
+        """
+        Evaluate the gradient (k - 1) / x - 1 / theta of the log density at a point x,
+        set to 0 outside the support where the log density is -inf.
+        """
+        return self.grad_log_density_batch(np.reshape(x, (1, self.dim)))[0]
+
+    def grad_log_density_batch(self, x):
+        """
+        Evaluate the gradient of the log density at each row of an (n, d) array x, see grad_log_density.
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(x > 0, (self.shape - 1) / x - 1 / self.scale, 0.0)
     
-    def draw_sample(self, beta=1.0):
-        """Draw a sample from the target distribution. This is meant to be a cheap heuristic
-        used for constructing the temperature ladder in parallel tempering.
-        Do not use this to draw samples in an actual Metropolis algorithm."""
-        adjusted_shape = self.shape * beta
-        return gamma.rvs(a=adjusted_shape, scale=self.scale, size=self.dim)
+    def draw_sample(self, beta=1.0, size=None):
+        """Draw exact samples from the tempered distribution. The tempered density
+        x^(beta (k - 1)) exp(-beta x / theta) of each coordinate is Gamma(beta (k - 1) + 1, theta / beta)."""
+        if beta <= 0:
+            raise ValueError("Inverse temperature parameter beta must be positive.")
+        adjusted_shape = beta * (self.shape - 1) + 1
+        shape = self.dim if size is None else (size, self.dim)
+        return np.random.gamma(adjusted_shape, self.scale / beta, size=shape)
     
 
 class IIDBeta(TargetDistribution):
@@ -66,38 +97,72 @@ class IIDBeta(TargetDistribution):
         """
         return self.name
     
-    def density(self, x):
+    def log_density(self, x):
         """
-        Evaluate the density at a point x in d-dimensional space.
+        Evaluate the log density at a point x in d-dimensional space.
+        The per-coordinate log densities are summed, so this does not underflow in high dimensions.
         
         Parameters:
         x (array-like): A point in d-dimensional space.
         
         Returns:
-        float: The density evaluated at x.
+        float: The log density evaluated at x.
         """
         if len(x) != self.dim:
             raise ValueError("Dimension of x must be equal to the specified dimensions.")
         
-        return np.prod(beta.pdf(x, a=self.alpha, b=self.beta))
+        return np.sum(beta.logpdf(x, a=self.alpha, b=self.beta))
+
+    def log_density_batch(self, x):
+        """
+        Evaluate the log density at each row of an (n, d) array x in one vectorized call.
+
+        Parameters:
+        x (array-like): Points of shape (n, d).
+
+        Returns:
+        numpy.ndarray: The n log densities.
+        """
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 0 or x.shape[-1] != self.dim:
+            raise ValueError("Dimension of x must be equal to the specified dimensions.")
+
+        x = x.reshape(-1, self.dim)
+        return np.sum(beta.logpdf(x, a=self.alpha, b=self.beta), axis=1)
+
+    def grad_log_density(self, x):
+        """
+        Evaluate the gradient (a - 1) / x - (b - 1) / (1 - x) of the log density at a point x,
+        set to 0 outside the support where the log density is -inf.
+        """
+        return self.grad_log_density_batch(np.reshape(x, (1, self.dim)))[0]
+
+    def grad_log_density_batch(self, x):
+        """
+        Evaluate the gradient of the log density at each row of an (n, d) array x, see grad_log_density.
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where((x > 0) & (x < 1), (self.alpha - 1) / x - (self.beta - 1) / (1 - x), 0.0)
     
-    def draw_sample(self, beta_temp=1.0):
-        """Draw a sample from the target distribution. This is meant to be a cheap heuristic
-        used for constructing the temperature ladder in parallel tempering.
-        Do not use this to draw samples in an actual Metropolis algorithm.
+    def draw_sample(self, beta_temp=1.0, size=None):
+        """Draw exact samples from the tempered distribution. The tempered density
+        x^(beta (a - 1)) (1 - x)^(beta (b - 1)) of each coordinate is Beta(beta (a - 1) + 1, beta (b - 1) + 1).
         
         Parameters:
         beta_temp (float): The inverse temperature parameter.
+        size (int): Number of samples to draw, a single sample if None.
         
         Returns:
-        numpy.ndarray: A sample from the target density.
+        numpy.ndarray: A sample (or size samples) from the target density.
         """
         if beta_temp <= 0:
             raise ValueError("Inverse temperature parameter beta_temp must be positive.")
 
         # Adjust the alpha and beta parameters by the inverse temperature beta_temp
-        adjusted_alpha = self.alpha * beta_temp
-        adjusted_beta = self.beta * beta_temp
+        adjusted_alpha = beta_temp * (self.alpha - 1) + 1
+        adjusted_beta = beta_temp * (self.beta - 1) + 1
 
         # Draw samples from the adjusted Beta distribution
-        return beta.rvs(a=adjusted_alpha, b=adjusted_beta, size=self.dim)
+        shape = self.dim if size is None else (size, self.dim)
+        return np.random.beta(adjusted_alpha, adjusted_beta, size=shape)
@@ -1,66 +1,163 @@
 import numpy as np
 from interfaces import TargetDistribution
-from scipy.stats import multivariate_normal
+from scipy.linalg import cho_solve, solve_triangular
+from scipy.special import logsumexp, softmax
 
-class ThreeMixtureDistribution(TargetDistribution):
-    """Class for a multimodal target distribution with three modes:
-        one at (-c, 0, 0, ..., 0), 
-        one at (0, 0, 0, ..., 0), 
-        and one at (c, 0, 0, ..., 0) where c is some constant
-        that is defined by the target distribution init method."""
+class GaussianMixtureDistribution(TargetDistribution):
+    """Class for a mixture of K Gaussian distributions with arbitrary means, covariance matrices and weights.
 
-    def __init__(self, dimension, scaling=False):
-        """Initialize the multimodal distribution with three modes.
-        Set the locations of the means and the covariance matrices for each mode."""
-        super().__init__(dimension)
-        self.name = "ThreeMixture"
-        if scaling:
-            self.name = "ThreeMixtureScaled"
-        self.means = [np.zeros(self.dim), np.zeros(self.dim), np.zeros(self.dim)]
-        self.means[0][0], self.means[2][0] = -5, 5
+    The Cholesky factors, log-determinants and log-weights of the components are computed once,
+    so a log density evaluation is one triangular solve per component followed by a logsumexp
+    over the components, vectorized over any number of points. If all covariance matrices are
+    diagonal only their diagonals are kept, and an evaluation costs O(K d) per point."""
 
-        ### Choose which covariance matrix to use!
-        # self.covs = [np.eye(self.dim) / np.sqrt(self.dim), np.eye(self.dim) / np.sqrt(self.dim), np.eye(self.dim) / np.sqrt(self.dim)]
-        # self.covs = [np.eye(self.dim) * 0.6, np.eye(self.dim) * 1.0, np.eye(self.dim) * 1.4]
-        self.covs = [np.eye(self.dim), np.eye(self.dim), np.eye(self.dim)]
-        if scaling:
-            self.scaling_factors = np.random.uniform(0.000001, 2, self.dim)    # Randomly sample scaling factors, must have mean 1
-            for i in range(len(self.covs)):
-                self.covs[i] *= self.scaling_factors
+    def __init__(self, dimension, means, covs, weights=None):
+        """Initialize the Gaussian mixture distribution.
+
+        Args:
+            dimension (int): Dimension of the distribution.
+            means (list): The K mean vectors of the components.
+            covs (list): The K covariance matrices of the components.
+            weights (np.ndarray): The K mixture weights, equal weights by default.
+        """
+        super().__init__(dimension)
+        self.name = "GaussianMixture"
+        self.means = [np.asarray(mean, dtype=float) for mean in means]
+        self.covs = [np.asarray(cov, dtype=float) for cov in covs]
+        if weights is None:
+            weights = np.full(len(self.means), 1 / len(self.means))
+        self.weights = np.asarray(weights, dtype=float)
+        if not len(self.means) == len(self.covs) == len(self.weights):
+            raise ValueError("Please provide one mean, covariance matrix and weight per component.")
+        if np.any(self.weights < 0) or not np.isclose(np.sum(self.weights), 1):
+            raise ValueError("The mixture weights must be non-negative and sum to 1.")
+        self.precompute_factors()
 
     def get_name(self):
         """
         Return the name of the target distribution as a string.
         """
         return self.name
-    
-    def density(self, x):
-        """Compute the density of the multimodal distribution at a given point x.
-        This density function has three modes: one at (-c, 0, 0, ..., 0), 
-        one at (0, 0, 0, ..., 0), and one at (c, 0, 0, ..., 0) where c is some constant
-        that is defined by the target distribution init method.
+
+    def precompute_factors(self):
+        """Compute the Cholesky factors (or diagonals), log-determinants and log-weights of the components.
+        Call this again after changing means, covs or weights."""
+        self.component_means = np.array(self.means)                         # (K, dim)
+        with np.errstate(divide='ignore'):
+            self.log_weights = np.log(self.weights)
+        self.diagonal = all(np.count_nonzero(cov - np.diag(np.diag(cov))) == 0 for cov in self.covs)
+        if self.diagonal:
+            self.component_vars = np.array([np.diag(cov) for cov in self.covs])     # (K, dim)
+            self.log_dets = np.sum(np.log(self.component_vars), axis=1)
+        else:
+            self.cholesky_factors = np.array([np.linalg.cholesky(cov) for cov in self.covs])   # (K, dim, dim)
+            self.log_dets = 2 * np.sum(np.log(np.diagonal(self.cholesky_factors, axis1=1, axis2=2)), axis=1)
+
+    def log_density(self, x):
+        """Compute the log density of the mixture at a given point x.
+        The components are combined with logsumexp so that it does not underflow far from the modes.
         Args:
             x (np.ndarray): A datapoint.
 
         Returns:
-            float: The density value for the input data point.
+            float: The log density value for the input data point.
         """
-        # Calculate the density for each mode and sum them
-        density = 0
-        for mean, cov in zip(self.means, self.covs):
-            density += 1/3 * multivariate_normal.pdf(x, mean=mean, cov=cov)
+        return self.log_density_batch(np.reshape(x, (1, self.dim)))[0]
 
-        return density
-    
-    def draw_sample(self, beta=1):
-        """Draw a sample from the target distribution. This is meant to be a cheap heuristic
-        used for constructing the temperature ladder in parallel tempering.
-        Do not use this to draw samples in an actual Metropolis algorithm."""
-        # pick a mode at random and sample from the mode
-        random_integer = np.random.randint(0, 3)  
-        target_mean, target_cov = self.means[random_integer], self.covs[random_integer]
-        
-        return np.random.multivariate_normal(target_mean, target_cov / beta)
+    def log_density_batch(self, x):
+        """Compute the log density of the mixture at each row of an (n, dim) array x."""
+        return logsumexp(self.log_weighted_component_densities(x), axis=1)
+
+    def grad_log_density(self, x):
+        """Compute the gradient of the log density of the mixture at a given point x."""
+        return self.grad_log_density_batch(np.reshape(x, (1, self.dim)))[0]
+
+    def grad_log_density_batch(self, x):
+        """Compute the gradient of the log density at each row of an (n, dim) array x. It is the average of
+        the component gradients -cov_k^-1 (x - mean_k), weighted by the posterior probabilities of the components."""
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        responsibilities = softmax(self.log_weighted_component_densities(x), axis=1)     # (n, K)
+        diffs = x[:, None, :] - self.component_means
+        if self.diagonal:
+            precision_diffs = diffs / self.component_vars
+        else:
+            precision_diffs = np.stack([cho_solve((factor, True), diffs[:, k].T, check_finite=False).T
+                                        for k, factor in enumerate(self.cholesky_factors)], axis=1)
+        return -np.einsum('nk,nkd->nd', responsibilities, precision_diffs)
+
+    def log_weighted_component_densities(self, x):
+        """Return log(w_k) + log N(x; mean_k, cov_k) for each row of an (n, dim) array x and each component k,
+        as an (n, K) array."""
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        diffs = x[:, None, :] - self.component_means      # (n, K, dim)
+        if self.diagonal:
+            squared_norms = np.sum(diffs ** 2 / self.component_vars, axis=2)
+        else:
+            squared_norms = np.stack([np.sum(solve_triangular(factor, diffs[:, k].T, lower=True, check_finite=False) ** 2, axis=0)
+                                      for k, factor in enumerate(self.cholesky_factors)], axis=1)
+        return self.log_weights - 0.5 * (self.dim * np.log(2 * np.pi) + self.log_dets + squared_norms)
+
+    def draw_sample(self, beta=1, size=None):
+        """Draw exact samples from the tempered mixture, whose density is proportional to p(x)^beta, for 0 < beta <= 1.
+
+        Since (sum_k w_k N_k(x))^beta <= sum_k w_k^beta N_k(x)^beta, the draws are made by rejection sampling
+        from the mixture of the tempered components N(mean_k, cov_k / beta) with weights proportional to
+        w_k^beta |cov_k|^((1 - beta) / 2). Nearly every draw is accepted when the modes are well separated.
+        All samples are drawn at once and only the rejected ones are drawn again.
+
+        Args:
+            beta (float): The inverse temperature.
+            size (int): Number of samples to draw, a single sample if None.
+        """
+        if not 0 < beta <= 1:
+            raise ValueError("The inverse temperature beta must be in (0, 1].")
+        num_samples = 1 if size is None else size
+        with np.errstate(invalid='ignore'):
+            log_proposal_weights = beta * self.log_weights + 0.5 * (1 - beta) * self.log_dets
+        proposal_weights = np.exp(log_proposal_weights - logsumexp(log_proposal_weights))
+        samples = np.empty((num_samples, self.dim))
+        remaining = np.arange(num_samples)
+        while len(remaining) > 0:
+            components = np.random.choice(len(self.weights), size=len(remaining), p=proposal_weights)
+            noise = np.random.standard_normal((len(remaining), self.dim))
+            if self.diagonal:
+                draws = self.component_means[components] + noise * np.sqrt(self.component_vars[components] / beta)
+            else:
+                draws = self.component_means[components] + np.einsum('nij,nj->ni', self.cholesky_factors[components], noise) / np.sqrt(beta)
+            log_components = self.log_weighted_component_densities(draws)
+            log_accept_probs = beta * logsumexp(log_components, axis=1) - logsumexp(beta * log_components, axis=1)
+            accepted = np.log(np.random.random(len(remaining))) < log_accept_probs
+            samples[remaining[accepted]] = draws[accepted]
+            remaining = remaining[~accepted]
+        return samples[0] if size is None else samples
+
+
+class ThreeMixtureDistribution(GaussianMixtureDistribution):
+    """Class for a multimodal target distribution with three modes:
+        one at (-c, 0, 0, ..., 0), 
+        one at (0, 0, 0, ..., 0), 
+        and one at (c, 0, 0, ..., 0) where c is some constant
+        that is defined by the target distribution init method."""
+
+    def __init__(self, dimension, scaling=False):
+        """Initialize the multimodal distribution with three modes.
+        Set the locations of the means and the covariance matrices for each mode."""
+        means = [np.zeros(dimension), np.zeros(dimension), np.zeros(dimension)]
+        means[0][0], means[2][0] = -5, 5
+
+        ### Choose which covariance matrix to use!
+        # covs = [np.eye(dimension) / np.sqrt(dimension), np.eye(dimension) / np.sqrt(dimension), np.eye(dimension) / np.sqrt(dimension)]
+        # covs = [np.eye(dimension) * 0.6, np.eye(dimension) * 1.0, np.eye(dimension) * 1.4]
+        covs = [np.eye(dimension), np.eye(dimension), np.eye(dimension)]
+        if scaling:
+            scaling_factors = np.random.uniform(0.000001, 2, dimension)    # Randomly sample scaling factors, must have mean 1
+            for i in range(len(covs)):
+                covs[i] *= scaling_factors
+        super().__init__(dimension, means, covs)
+        self.name = "ThreeMixture"
+        if scaling:
+            self.name = "ThreeMixtureScaled"
+            self.scaling_factors = scaling_factors
     
 
 class RoughCarpetDistribution(TargetDistribution):
@@ -89,28 +186,55 @@ class RoughCarpetDistribution(TargetDistribution):
         mode2 = np.exp(-0.5 * (x - self.modes[2])**2) / np.sqrt(2 * np.pi)
         return self.weights[0] * mode0 + self.weights[1] * mode1 + self.weights[2] * mode2
     
-    def density(self, x):
-        """Compute the density of the multimodal distribution at a given point x."""
-        if isinstance(x, (int, float)) or len(x) == 1:
-            if hasattr(self, 'scaling_factors'):
-                return self.scaling_factors[0] * self.density_1d(self.scaling_factors[0] * x)
-            else:
-                return self.density_1d(x)
-            
-        elif hasattr(self, 'scaling_factors'):
-                return np.prod([self.scaling_factors[i] * self.density_1d(self.scaling_factors[i] * x[i])
-                            for i in range(self.dim)])
-        else:  
-            return np.prod([self.density_1d(x[i]) for i in range(self.dim)])
-
-    def draw_sample(self, beta=1):
-        """Draw a sample from the target distribution. This is meant to be a cheap heuristic
-        used for constructing the temperature ladder in parallel tempering.
-        Do not use this to draw samples in an actual Metropolis algorithm."""
-        sample = np.zeros(self.dim)
-
-        for i in range(self.dim):
-            mean_value = np.random.choice(self.modes, p=self.weights)
-            sample[i] = np.random.normal(mean_value, 1 / beta)
-        
-        return sample
\ No newline at end of file
+    def log_density_1d(self, x):
+        """Compute the log density of a multimodal 1D distribution with three modes.
+        Works elementwise on arrays and uses logsumexp over the modes."""
+        x = np.asarray(x)[..., None]
+        log_modes = -0.5 * (x - np.array(self.modes))**2 - 0.5 * np.log(2 * np.pi)
+        return logsumexp(log_modes, b=np.array(self.weights), axis=-1)
+    
+    def grad_log_density_1d(self, x):
+        """Compute the derivative of the log density of the multimodal 1D distribution, elementwise on arrays.
+        It is the average of (mode - x) weighted by the posterior probabilities of the modes."""
+        x = np.asarray(x)[..., None]
+        responsibilities = softmax(np.log(self.weights) - 0.5 * (x - np.array(self.modes))**2, axis=-1)
+        return np.sum(responsibilities * (np.array(self.modes) - x), axis=-1)
+
+    def log_density(self, x):
+        """Compute the log density of the multimodal distribution at a given point x.
+        The per-coordinate log densities are summed, so this does not underflow in high dimensions."""
+        x = np.atleast_1d(x)
+        if hasattr(self, 'scaling_factors'):
+            scaling_factors = self.scaling_factors[:len(x)]
+            return np.sum(np.log(scaling_factors) + self.log_density_1d(scaling_factors * x))
+        return np.sum(self.log_density_1d(x))
+
+    def log_density_batch(self, x):
+        """Compute the log density at each row of an (n, dim) array x.
+        The 1D log densities of all coordinates of all rows are evaluated at once."""
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        if hasattr(self, 'scaling_factors'):
+            return np.sum(np.log(self.scaling_factors)) + np.sum(self.log_density_1d(self.scaling_factors * x), axis=1)
+        return np.sum(self.log_density_1d(x), axis=1)
+
+    def grad_log_density(self, x):
+        """Compute the gradient of the log density at a given point x."""
+        return self.grad_log_density_batch(np.reshape(x, (1, self.dim)))[0]
+
+    def grad_log_density_batch(self, x):
+        """Compute the gradient of the log density at each row of an (n, dim) array x, coordinate by coordinate."""
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        if hasattr(self, 'scaling_factors'):
+            return self.scaling_factors * self.grad_log_density_1d(self.scaling_factors * x)
+        return self.grad_log_density_1d(x)
+
+    def draw_sample(self, beta=1, size=None):
+        """Draw exact samples from the tempered distribution, whose density is proportional to p(x)^beta, for 0 < beta <= 1.
+        The coordinates are independent, so all coordinates of all samples are drawn at once from the
+        tempered 1D mixture (see GaussianMixtureDistribution.draw_sample) and divided by the scaling factors."""
+        num_samples = 1 if size is None else size
+        mixture_1d = GaussianMixtureDistribution(1, [[mode] for mode in self.modes], [np.eye(1)] * len(self.modes), self.weights)
+        samples = mixture_1d.draw_sample(beta, num_samples * self.dim).reshape(num_samples, self.dim)
+        if hasattr(self, 'scaling_factors'):
+            samples = samples / self.scaling_factors
+        return samples[0] if size is None else samples
\ No newline at end of file
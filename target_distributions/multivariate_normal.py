@@ -1,40 +1,99 @@
 import numpy as np
 from interfaces import TargetDistribution
-from scipy.stats import norm, multivariate_normal
+from scipy.stats import norm
+from scipy.linalg import cho_solve, cho_solve_banded, cholesky_banded, solve_banded, solve_triangular
 
 class MultivariateNormal(TargetDistribution):
     """
     Class representing a multivariate normal distribution.
     Default has zero mean and identity covariance matrix.
+
+    The covariance matrix can be given with one of the following structures (cov_structure),
+    which are factorized once so that log densities and samples cost what the structure allows:
+        "dense": a (dim, dim) matrix, with a cached Cholesky factor, O(d^2) per point.
+        "diagonal": a vector of dim variances, O(d) per point.
+        "banded": a symmetric banded matrix given in lower banded form, an array ab of shape
+            (bandwidth + 1, dim) with ab[i, j] = cov[i + j, j] (bandwidth 1 is tridiagonal), O(d * bandwidth) per point.
+        "low_rank": diag(cov) + cov_factor @ cov_factor.T, where cov is a vector of dim variances and
+            cov_factor a (dim, k) matrix, evaluated with the Woodbury identity in O(d * k) per point.
     """
 
-    def __init__(self, dim, mean=None, cov=None):
+    def __init__(self, dim, mean=None, cov=None, cov_structure=None, cov_factor=None):
         """
         Initializes the MultivariateNormal distribution with a mean vector and covariance matrix.
 
         Args:
             mean (np.ndarray): Mean vector of the distribution.
-            cov (np.ndarray): Covariance matrix of the distribution.
+            cov (np.ndarray): Covariance matrix of the distribution, in the form given by cov_structure.
+            cov_structure (str): "dense", "diagonal", "banded" or "low_rank". Defaults to "dense" if cov is
+                given and to a diagonal identity covariance matrix otherwise.
+            cov_factor (np.ndarray): The (dim, k) low-rank factor of a "low_rank" covariance matrix.
         """
         super().__init__(dim)  # Dimension based on mean vector size
         self.name = "MultivariateNormal"
         if mean is None:
             mean = np.zeros(dim)
         if cov is None:
-            cov = np.eye(dim)
-        self.mean = mean
-        self.cov = cov
+            cov, cov_structure = np.ones(dim), "diagonal"
+        elif cov_structure is None:
+            cov_structure = "dense"
+        self.mean = np.asarray(mean, dtype=float)
+        self.cov_structure = cov_structure
+
+        if cov_structure == "dense":
+            self.cov_matrix = np.asarray(cov, dtype=float)
+            self.cholesky_factor = np.linalg.cholesky(self.cov_matrix)
+            self.log_det = 2 * np.sum(np.log(np.diag(self.cholesky_factor)))
+            self.variances = np.diag(self.cov_matrix).copy()
+        elif cov_structure == "diagonal":
+            self.variances = np.broadcast_to(np.asarray(cov, dtype=float), (dim,)).copy()
+            self.log_det = np.sum(np.log(self.variances))
+        elif cov_structure == "banded":
+            self.cov_banded = np.asarray(cov, dtype=float)
+            self.bandwidth = self.cov_banded.shape[0] - 1
+            self.cholesky_banded = cholesky_banded(self.cov_banded, lower=True)
+            self.log_det = 2 * np.sum(np.log(self.cholesky_banded[0]))
+            self.variances = self.cov_banded[0].copy()
+        elif cov_structure == "low_rank":
+            if cov_factor is None:
+                raise ValueError("Please provide the cov_factor of the low-rank covariance matrix.")
+            self.cov_diag = np.broadcast_to(np.asarray(cov, dtype=float), (dim,)).copy()
+            self.cov_factor = np.asarray(cov_factor, dtype=float).reshape(dim, -1)
+            # Woodbury identity with the capacitance matrix I + F^T D^-1 F
+            capacitance = np.eye(self.cov_factor.shape[1]) + self.cov_factor.T @ (self.cov_factor / self.cov_diag[:, None])
+            self.capacitance_cholesky = np.linalg.cholesky(capacitance)
+            self.log_det = np.sum(np.log(self.cov_diag)) + 2 * np.sum(np.log(np.diag(self.capacitance_cholesky)))
+            self.variances = self.cov_diag + np.sum(self.cov_factor ** 2, axis=1)
+        else:
+            raise ValueError(f"Unknown covariance structure '{cov_structure}', "
+                             "please use 'dense', 'diagonal', 'banded' or 'low_rank'.")
 
     def get_name(self):
         """
         Return the name of the target distribution as a string.
         """
         return self.name
-    
+
+    @property
+    def cov(self):
+        """The covariance matrix as a dense (dim, dim) array. This costs O(d^2) memory for the structured covariances."""
+        if self.cov_structure == "dense":
+            return self.cov_matrix
+        if self.cov_structure == "diagonal":
+            return np.diag(self.variances)
+        if self.cov_structure == "banded":
+            cov = np.zeros((self.dim, self.dim))
+            for i in range(self.bandwidth + 1):
+                cov += np.diag(self.cov_banded[i, :self.dim - i], -i)
+                if i > 0:
+                    cov += np.diag(self.cov_banded[i, :self.dim - i], i)
+            return cov
+        return np.diag(self.cov_diag) + self.cov_factor @ self.cov_factor.T
+
     def density_1d(self, x):
         """
         Evaluates the probability density function (PDF) at a point x. Assumes that the distribution is 1D.
-        If evaluating a single component of a multi-dimensional x, the use of this function assumes that 
+        If evaluating a single component of a multi-dimensional x, the use of this function assumes that
         the other components are independent.
         Args:
             x (np.ndarray): Point in the multivariate normal distribution domain with the same dimension as the mean vector.
@@ -42,21 +101,98 @@ class MultivariateNormal(TargetDistribution):
         Returns:
             float: The value of the PDF at the point x.
         """
-        return norm.pdf(x, loc=self.mean[0], scale=np.sqrt(self.cov[0][0]))
-    
-    def density(self, x):
+        return norm.pdf(x, loc=self.mean[0], scale=np.sqrt(self.variances[0]))
+
+    def squared_mahalanobis_distances(self, diffs):
+        """
+        Return diff^T cov^-1 diff for each row of an (n, dim) array of differences from the mean,
+        at the cost of the covariance structure.
         """
-        Evaluates the probability density function (PDF) at a point x.
+        if self.cov_structure == "dense":
+            whitened = solve_triangular(self.cholesky_factor, diffs.T, lower=True, check_finite=False)
+            return np.sum(whitened ** 2, axis=0)
+        if self.cov_structure == "diagonal":
+            return np.sum(diffs ** 2 / self.variances, axis=1)
+        if self.cov_structure == "banded":
+            whitened = solve_banded((self.bandwidth, 0), self.cholesky_banded, diffs.T, check_finite=False)
+            return np.sum(whitened ** 2, axis=0)
+        scaled_diffs = diffs / self.cov_diag
+        projected = solve_triangular(self.capacitance_cholesky, (scaled_diffs @ self.cov_factor).T, lower=True, check_finite=False)
+        return np.sum(diffs * scaled_diffs, axis=1) - np.sum(projected ** 2, axis=0)
+
+    def precision_dot(self, diffs):
+        """
+        Return cov^-1 diff for each row of an (n, dim) array of differences from the mean,
+        at the cost of the covariance structure.
+        """
+        if self.cov_structure == "dense":
+            return cho_solve((self.cholesky_factor, True), diffs.T, check_finite=False).T
+        if self.cov_structure == "diagonal":
+            return diffs / self.variances
+        if self.cov_structure == "banded":
+            return cho_solve_banded((self.cholesky_banded, True), diffs.T, check_finite=False).T
+        scaled_diffs = diffs / self.cov_diag
+        correction = cho_solve((self.capacitance_cholesky, True), (scaled_diffs @ self.cov_factor).T, check_finite=False).T
+        return scaled_diffs - (correction @ self.cov_factor.T) / self.cov_diag
+
+    def log_density(self, x):
+        """
+        Evaluates the log of the probability density function (PDF) at a point x.
 
         Args:
             x (np.ndarray): Point in the multivariate normal distribution domain with the same dimension as the mean vector.
 
         Returns:
-            float: The value of the PDF at the point x.
+            float: The value of the log PDF at the point x.
         """
-        if isinstance(x, (int, float)) or len(x) == 1:
-            return self.density_1d(x)
-        return multivariate_normal.pdf(x, mean=self.mean, cov=self.cov)
+        return self.log_density_batch(np.reshape(x, (1, self.dim)))[0]
 
-    def draw_sample(self, beta=1):
-        return np.random.multivariate_normal(self.mean, self.cov / beta)
\ No newline at end of file
+    def log_density_batch(self, x):
+        """
+        Evaluates the log PDF at each row of an (n, dim) array x in one call, using the precomputed factorization.
+
+        Args:
+            x (np.ndarray): Points of shape (n, dim).
+
+        Returns:
+            np.ndarray: The n values of the log PDF.
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        return -0.5 * (self.dim * np.log(2 * np.pi) + self.log_det + self.squared_mahalanobis_distances(x - self.mean))
+
+    def grad_log_density(self, x):
+        """
+        Evaluates the gradient of the log PDF, -cov^-1 (x - mean), at a point x.
+        """
+        return self.grad_log_density_batch(np.reshape(x, (1, self.dim)))[0]
+
+    def grad_log_density_batch(self, x):
+        """
+        Evaluates the gradient of the log PDF at each row of an (n, dim) array x.
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        return -self.precision_dot(x - self.mean)
+
+    def draw_sample(self, beta=1, size=None):
+        """
+        Draws exact samples from the tempered distribution N(mean, cov / beta), at the cost of the covariance structure.
+
+        Args:
+            beta (float): The inverse temperature.
+            size (int): Number of samples to draw, a single sample if None.
+        """
+        num_samples = 1 if size is None else size
+        noise = np.random.standard_normal((num_samples, self.dim))
+        if self.cov_structure == "dense":
+            correlated = noise @ self.cholesky_factor.T
+        elif self.cov_structure == "diagonal":
+            correlated = noise * np.sqrt(self.variances)
+        elif self.cov_structure == "banded":
+            # multiply by the banded lower Cholesky factor, one diagonal at a time
+            correlated = np.zeros_like(noise)
+            for i in range(self.bandwidth + 1):
+                correlated[:, i:] += self.cholesky_banded[i, :self.dim - i] * noise[:, :self.dim - i]
+        else:
+            correlated = noise * np.sqrt(self.cov_diag) + np.random.standard_normal((num_samples, self.cov_factor.shape[1])) @ self.cov_factor.T
+        samples = self.mean + correlated / np.sqrt(beta)
+        return samples[0] if size is None else samples